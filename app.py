@@ -1,54 +1,114 @@
 from __future__ import annotations
 
+import bisect
+import concurrent.futures
+import csv
+import fcntl
+import gzip
+import hashlib
+import io
 import json
 import json
+import mimetypes
+import multiprocessing
 import os
+import re
+import secrets
+import shutil
 import smtplib
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
 from email.message import EmailMessage
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from stat import S_ISREG
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
 from flask import (
     Flask,
+    Request,
+    Response,
+    before_render_template,
+    g,
+    got_request_exception,
+    has_request_context,
     jsonify,
     redirect,
     render_template,
     request,
+    request_finished,
+    request_started,
     send_from_directory,
     session,
+    stream_with_context,
+    template_rendered,
     url_for,
 )
-from werkzeug.security import check_password_hash, generate_password_hash
+from markupsafe import Markup
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     MetaData,
     String,
     Table,
     Text,
     create_engine,
+    event,
+    func,
+    literal_column,
     select,
     text,
+    union_all,
 )
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.pool import QueuePool
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import http_date, parse_content_range_header, parse_range_header
 from werkzeug.security import check_password_hash
-from werkzeug.utils import secure_filename
+from werkzeug.utils import safe_join, secure_filename
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # without Pillow no image derivatives are generated
+    Image = None
 
 BASE_DIR = Path(__file__).resolve().parent
-ASSET_DIR = BASE_DIR / "assets"
+ASSET_DIR = Path(os.getenv("ASSET_DIR", BASE_DIR / "assets"))
 UPLOAD_DIR = BASE_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_TMP_DIR = UPLOAD_DIR / ".tmp"
+DERIVATIVE_DIR = BASE_DIR / "derivatives"
+UPLOAD_BLOB_DIR = UPLOAD_DIR / "blobs"
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_SESSION_TTL = float(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 app.secret_key = os.getenv("SECRET_KEY", "change-me")
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "change-me")
 app.config["UPLOAD_DIR"] = str(BASE_DIR / "uploads")
+# Leave room for multipart boundaries and form fields around the file itself.
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES + 1024 * 1024
 
 os.makedirs(app.config["UPLOAD_DIR"], exist_ok=True)
 
@@ -72,41 +132,1079 @@ def _title_from_filename(name: str) -> str:
     return " ".join([part.capitalize() for part in cleaned.split() if part])
 
 
-def scan_assets() -> List[Dict[str, Any]]:
+DERIVATIVE_WIDTHS = tuple(
+    int(width) for width in os.getenv("DERIVATIVE_WIDTHS", "320,640,1280").split(",") if width
+)
+DERIVATIVE_WORKERS = int(os.getenv("DERIVATIVE_WORKERS", "2"))
+DERIVATIVES_ENABLED = os.getenv("DERIVATIVES_ENABLED", "true").lower() in {"1", "true", "yes"}
+DERIVATIVE_LOCK_TTL = 600
+# While a burst of jobs is finishing, the asset catalog is rebuilt at most
+# this often, plus once when the last job completes.
+DERIVATIVE_INVALIDATE_INTERVAL = float(os.getenv("DERIVATIVE_INVALIDATE_INTERVAL", "5"))
+DERIVATIVE_SUFFIXES = {".webp", ".avif", ".jpg"}
+MEDIA_VARIANT_CACHE_SIZE = int(os.getenv("MEDIA_VARIANT_CACHE_SIZE", "4096"))
+
+_derivative_pool: concurrent.futures.ProcessPoolExecutor | None = None
+_derivative_jobs: Dict[str, concurrent.futures.Future] = {}
+_derivative_skipped: set = set()
+_derivative_catalog_dirty = False
+_derivative_invalidated_at = 0.0
+_media_variant_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_derivative_lock = threading.Lock()
+
+
+def _derivative_key(path: Path, stat: os.stat_result) -> str:
+    name = path.relative_to(BASE_DIR) if path.is_relative_to(BASE_DIR) else path
+    return hashlib.sha1(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
+
+
+def _derivative_manifest_path(key: str) -> Path:
+    return DERIVATIVE_DIR / key[:2] / f"{key}.json"
+
+
+def _derivative_metadata(path: Path, stat: os.stat_result) -> Dict[str, Any] | None:
+    key = _derivative_key(path, stat)
+    try:
+        return json.loads(_derivative_manifest_path(key).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        _schedule_derivatives(path, key)
+        return None
+
+
+def _write_manifest(target_dir: Path, key: str, manifest: Dict[str, Any]) -> Dict[str, Any]:
+    tmp_manifest = target_dir / f".{key}.json.tmp"
+    tmp_manifest.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(tmp_manifest, target_dir / f"{key}.json")
+    return manifest
+
+
+def _generate_derivatives(
+    source: str, media_type: str, key: str, out_dir: str
+) -> Dict[str, Any] | None:
+    """Runs in a worker process: resize images (or a video's poster frame)
+    into WebP/AVIF widths and write the manifest ``scan_assets`` reads."""
+    target_dir = Path(out_dir) / key[:2]
+    target_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = target_dir / f"{key}.json"
+    lock_path = target_dir / f"{key}.lock"
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            pass
+        # Another gunicorn worker is generating this key: wait for its
+        # manifest so this process can pick the variants up too.
+        try:
+            while time.time() - lock_path.stat().st_mtime < DERIVATIVE_LOCK_TTL:
+                time.sleep(0.5)
+            # Its owner died: clear the stale lock and race for it again, so
+            # exactly one waiter takes over.
+            lock_path.unlink()
+        except FileNotFoundError:
+            pass
+        if manifest_path.exists():
+            return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    try:
+        if manifest_path.exists():
+            return json.loads(manifest_path.read_text(encoding="utf-8"))
+        manifest: Dict[str, Any] = {"key": key, "variants": []}
+        still = source
+        if media_type == "video":
+            ffmpeg = shutil.which("ffmpeg")
+            if not ffmpeg:
+                return None
+            poster = target_dir / f"poster-{key}.jpg"
+            # One second in skips fade-ins, but clips shorter than that have
+            # no frame there.
+            duration = _probe_media(Path(source), "video").get("duration")
+            seek = min(1.0, duration / 2) if duration else 0.0
+            subprocess.run(
+                [
+                    ffmpeg, "-v", "error", "-y", "-ss", f"{seek:.3f}", "-i", source,
+                    "-frames:v", "1", "-vf", f"scale='min({max(DERIVATIVE_WIDTHS)},iw)':-2",
+                    str(poster),
+                ],
+                check=True,
+                timeout=120,
+            )
+            manifest["poster"] = f"/derivatives/{key[:2]}/{poster.name}"
+            still = str(poster)
+
+        if Image is None:
+            return _write_manifest(target_dir, key, manifest) if "poster" in manifest else None
+        Image.init()
+        formats = ["webp"] + (["avif"] if ".avif" in Image.registered_extensions() else [])
+        with Image.open(still) as original:
+            image = ImageOps.exif_transpose(original).convert("RGB")
+        manifest["width"], manifest["height"] = image.size
+        widths = [width for width in DERIVATIVE_WIDTHS if width < image.width] or [image.width]
+        for width in widths:
+            resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            for fmt in formats:
+                name = f"{width}w-{key}.{fmt}"
+                tmp = target_dir / f".{name}.tmp"
+                resized.save(tmp, format=fmt.upper(), quality=80)
+                os.replace(tmp, target_dir / name)
+                manifest["variants"].append(
+                    {"url": f"/derivatives/{key[:2]}/{name}", "width": width, "format": fmt}
+                )
+
+        manifest["thumbnail"] = manifest["variants"][0]["url"]
+        manifest["srcset"] = {
+            fmt: ", ".join(
+                f"{variant['url']} {variant['width']}w"
+                for variant in manifest["variants"]
+                if variant["format"] == fmt
+            )
+            for fmt in formats
+        }
+        return _write_manifest(target_dir, key, manifest)
+    finally:
+        lock_path.unlink(missing_ok=True)
+
+
+def _derivative_done(key: str, path: Path, future: concurrent.futures.Future) -> None:
+    global _derivative_catalog_dirty, _derivative_invalidated_at
+    try:
+        manifest = future.result()
+    except Exception as exc:
+        print(f"Derivative generation failed for {key}: {exc}")
+        manifest = None
+    with _derivative_lock:
+        _derivative_jobs.pop(key, None)
+        if not manifest:
+            # Missing tooling or a broken file: don't resubmit it on every scan.
+            _derivative_skipped.add(key)
+        elif path.parent == ASSET_DIR:
+            # Uploads are looked up per URL; only gallery assets live in the catalog.
+            _derivative_catalog_dirty = True
+        # Every rebuild re-reads all manifests, so a warm-up of N files must
+        # not trigger N rebuilds.
+        now = time.monotonic()
+        invalidate = _derivative_catalog_dirty and (
+            not _derivative_jobs or now - _derivative_invalidated_at >= DERIVATIVE_INVALIDATE_INTERVAL
+        )
+        if invalidate:
+            _derivative_catalog_dirty = False
+            _derivative_invalidated_at = now
+    if invalidate:
+        asset_catalog.invalidate()
+
+
+def _schedule_derivatives(path: Path, key: str) -> None:
+    global _derivative_pool
+    if not DERIVATIVES_ENABLED:
+        return
+    with _derivative_lock:
+        if key in _derivative_jobs or key in _derivative_skipped:
+            return
+        if _derivative_pool is None:
+            # spawn rather than fork: the pool is created lazily inside a
+            # gunicorn worker that may already be running other threads.
+            _derivative_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=DERIVATIVE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        try:
+            future = _derivative_pool.submit(
+                _generate_derivatives, str(path), _media_type_for(path.name), key, str(DERIVATIVE_DIR)
+            )
+        except concurrent.futures.process.BrokenProcessPool:
+            # A crashed child poisons the pool; start a fresh one next time.
+            _derivative_pool = None
+            return
+        _derivative_jobs[key] = future
+    future.add_done_callback(lambda done: _derivative_done(key, path, done))
+
+
+def _media_variants(url: str) -> Dict[str, Any] | None:
+    with _derivative_lock:
+        cached = _media_variant_cache.get(url)
+        if cached is not None:
+            _media_variant_cache.move_to_end(url)
+    if cached is not None or not url.startswith("/uploads/"):
+        return cached
+    path = safe_join(str(UPLOAD_DIR), url[len("/uploads/"):])
+    try:
+        stat = os.stat(path) if path else None
+    except OSError:
+        stat = None
+    if stat is None:
+        return None
+    manifest = _derivative_metadata(Path(path), stat)
+    if manifest:
+        with _derivative_lock:
+            _media_variant_cache[url] = manifest
+            while len(_media_variant_cache) > MEDIA_VARIANT_CACHE_SIZE:
+                _media_variant_cache.popitem(last=False)
+    return manifest
+
+
+def _media_type_for(filename: str) -> str:
+    return "video" if filename.lower().endswith((".mp4", ".webm", ".mov")) else "image"
+
+
+def _mp4_boxes(handle, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    offset = start
+    while offset + 8 <= end:
+        handle.seek(offset)
+        size, kind = struct.unpack(">I4s", handle.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", handle.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def _probe_mp4(path: Path) -> Dict[str, Any]:
+    # Reads only the moov box headers, so probing costs a few small reads
+    # regardless of the video's length.
+    probe: Dict[str, Any] = {}
+    with path.open("rb") as handle:
+        size = path.stat().st_size
+        for kind, start, end in _mp4_boxes(handle, 0, size):
+            if kind != b"moov":
+                continue
+            for child, child_start, child_end in _mp4_boxes(handle, start, end):
+                if child == b"mvhd":
+                    handle.seek(child_start)
+                    version = handle.read(1)[0]
+                    if version == 1:
+                        handle.seek(child_start + 20)
+                        timescale, duration = struct.unpack(">IQ", handle.read(12))
+                    else:
+                        handle.seek(child_start + 12)
+                        timescale, duration = struct.unpack(">II", handle.read(8))
+                    if timescale:
+                        probe["duration"] = round(duration / timescale, 3)
+                elif child == b"trak" and "codec" not in probe:
+                    probe.update(_probe_mp4_track(handle, child_start, child_end))
+    return probe
+
+
+def _probe_mp4_track(handle, start: int, end: int) -> Dict[str, Any]:
+    track: Dict[str, Any] = {}
+    is_video = False
+    for kind, box_start, box_end in _mp4_boxes(handle, start, end):
+        if kind == b"tkhd":
+            handle.seek(box_end - 8)
+            width, height = struct.unpack(">II", handle.read(8))
+            track["width"], track["height"] = width >> 16, height >> 16
+        elif kind == b"mdia":
+            for mdia, mdia_start, mdia_end in _mp4_boxes(handle, box_start, box_end):
+                if mdia == b"hdlr":
+                    handle.seek(mdia_start + 8)
+                    is_video = handle.read(4) == b"vide"
+                elif mdia == b"minf":
+                    for minf, minf_start, minf_end in _mp4_boxes(handle, mdia_start, mdia_end):
+                        if minf != b"stbl":
+                            continue
+                        for stbl, stbl_start, _ in _mp4_boxes(handle, minf_start, minf_end):
+                            if stbl == b"stsd":
+                                handle.seek(stbl_start + 12)
+                                track["codec"] = handle.read(4).decode("latin-1").strip()
+    return track if is_video else {}
+
+
+def _probe_media(path: Path, asset_type: str) -> Dict[str, Any]:
+    probe: Dict[str, Any] = {}
+    try:
+        if asset_type == "image":
+            if Image is not None:
+                with Image.open(path) as image:
+                    probe["width"], probe["height"] = image.size
+        elif shutil.which("ffprobe"):
+            result = subprocess.run(
+                [
+                    "ffprobe", "-v", "error", "-select_streams", "v:0",
+                    "-show_entries", "stream=codec_name,width,height:format=duration",
+                    "-of", "json", str(path),
+                ],
+                capture_output=True,
+                check=True,
+                timeout=30,
+            )
+            info = json.loads(result.stdout or b"{}")
+            stream = (info.get("streams") or [{}])[0]
+            probe = {
+                "width": stream.get("width"),
+                "height": stream.get("height"),
+                "codec": stream.get("codec_name"),
+                "duration": float(info.get("format", {}).get("duration") or 0) or None,
+            }
+        elif path.suffix.lower() in {".mp4", ".mov"}:
+            probe = _probe_mp4(path)
+    except Exception as exc:
+        print(f"Media probe failed for {path.name}: {exc}")
+    return probe
+
+
+def _index_values(path: Path, stat: os.stat_result) -> Dict[str, Any]:
+    asset_type = _media_type_for(path.name)
+    probe = _probe_media(path, asset_type)
+    return {
+        "path": path.name,
+        "content_hash": _file_sha256(path),
+        "size_bytes": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "asset_type": asset_type,
+        "width": probe.get("width"),
+        "height": probe.get("height"),
+        "duration": probe.get("duration"),
+        "codec": probe.get("codec"),
+        "indexed_at": datetime.utcnow(),
+    }
+
+
+def _write_asset_index(names: set, changed: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    with engine.begin() as conn:
+        rows = {row["path"]: dict(row) for row in conn.execute(select(asset_index)).mappings()}
+        orphans = {row["content_hash"]: row for name, row in rows.items() if name not in names}
+        for values in changed:
+            existing = rows.get(values["path"]) or orphans.pop(values["content_hash"], None)
+            if existing:
+                conn.execute(asset_index.update().where(asset_index.c.id == existing["id"]).values(**values))
+                rows.pop(existing["path"], None)
+                rows[values["path"]] = {**existing, **values}
+            else:
+                # Another worker indexing the same directory may have inserted
+                # this path since the select above; its row (and id) wins.
+                conn.execute(
+                    _upsert_insert(asset_index)
+                    .values(**values)
+                    .on_conflict_do_nothing(index_elements=[asset_index.c.path])
+                )
+
+        stale = [row["id"] for name, row in rows.items() if name not in names]
+        if stale:
+            conn.execute(asset_index.delete().where(asset_index.c.id.in_(stale)))
+        return {row["path"]: dict(row) for row in conn.execute(select(asset_index)).mappings()}
+
+
+def _sync_asset_index(files: List[Tuple[Path, os.stat_result]]) -> Dict[str, Dict[str, Any]]:
+    """Bring ``asset_index`` in line with the files on disk.
+
+    Unchanged files (same size and mtime) are not read at all; changed or new
+    ones are hashed and probed once, outside any transaction. A file whose
+    content reappears under a new name keeps its id, so renames do not
+    reshuffle the catalog.
+    """
+    names = {path.name for path, _ in files}
+    with engine.connect() as conn:
+        known = {
+            row.path: (row.size_bytes, row.mtime_ns)
+            for row in conn.execute(select(asset_index.c.path, asset_index.c.size_bytes, asset_index.c.mtime_ns))
+        }
+    changed = [
+        _index_values(path, stat)
+        for path, stat in files
+        if known.get(path.name) != (stat.st_size, stat.st_mtime_ns)
+    ]
+    try:
+        return _write_asset_index(names, changed)
+    except IntegrityError:
+        # A concurrent rename or insert moved a path under us; the second pass
+        # sees the other worker's rows and converges on the same ids.
+        return _write_asset_index(names, changed)
+
+
+def scan_assets() -> Tuple[List[Dict[str, Any]], bool]:
+    """Return the catalog entries and whether they carry indexed ids."""
     assets: List[Dict[str, Any]] = []
     if not ASSET_DIR.exists():
-        return assets
+        return assets, True
+
+    files = [(path, path.stat()) for path in sorted(ASSET_DIR.iterdir()) if path.is_file()]
+    try:
+        indexed = _sync_asset_index(files)
+    except SQLAlchemyError as exc:
+        # Without the index table, fall back to positional ids.
+        print(f"Asset index unavailable: {exc}")
+        indexed = None
 
-    files = sorted([p for p in ASSET_DIR.iterdir() if p.is_file()])
-    for idx, path in enumerate(files, start=1):
+    for idx, (path, stat) in enumerate(files, start=1):
         ext = path.suffix.lower()
         asset_type = "video" if ext in {".mp4", ".webm", ".mov"} else "image"
+        row = indexed.get(path.name) if indexed else None
+        asset_id = row["id"] if row else idx
         if asset_type == "video":
-            category = VIDEO_CATEGORIES[idx % len(VIDEO_CATEGORIES)]
+            category = VIDEO_CATEGORIES[asset_id % len(VIDEO_CATEGORIES)]
         else:
-            category = IMAGE_CATEGORIES[idx % len(IMAGE_CATEGORIES)]
+            category = IMAGE_CATEGORIES[asset_id % len(IMAGE_CATEGORIES)]
+
+        asset_metadata: Dict[str, Any] = {
+            "size_bytes": stat.st_size,
+            "extension": ext.replace(".", ""),
+        }
+        if row:
+            asset_metadata["content_hash"] = row["content_hash"]
+            for field in ("width", "height", "duration", "codec"):
+                if row.get(field) is not None:
+                    asset_metadata[field] = row[field]
+        variants = _derivative_metadata(path, stat)
+        if variants:
+            asset_metadata["variants"] = variants
 
         assets.append(
             {
-                "id": idx,
+                "id": asset_id,
                 "filename": path.name,
                 "filepath": f"/assets/{path.name}",
                 "asset_type": asset_type,
                 "category": category,
                 "title": _title_from_filename(path.stem),
-                "metadata": {
-                    "size_bytes": path.stat().st_size,
-                    "extension": ext.replace(".", ""),
-                },
+                "metadata": asset_metadata,
             }
         )
-    return assets
+    return assets, indexed is not None
+
+
+class AssetCatalog:
+    def __init__(self, directory: Path, check_interval: float = 1.0) -> None:
+        self.directory = directory
+        self.check_interval = check_interval
+        self.version = 0
+        self.assets: List[Dict[str, Any]] = []
+        self.stats = {"hits": 0, "misses": 0, "rebuilds": 0}
+        self._fingerprint: Tuple[int, int] | None = None
+        self._checked_at = 0.0
+        self._derived: Dict[str, Any] = {}
+        self._stale = False
+        self._lock = threading.Lock()
+        # Held for the whole scan (hashing and probing new files), so only one
+        # thread rebuilds; ``_lock`` only guards the swap.
+        self._build_lock = threading.Lock()
+
+    def _current_fingerprint(self) -> Tuple[int, int] | None:
+        try:
+            stat = self.directory.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _rebuild(self, fingerprint: Tuple[int, int] | None) -> None:
+        assets, indexed = scan_assets()
+        with self._lock:
+            self.assets = assets
+            self._fingerprint = fingerprint
+            self._derived = {}
+            # A catalog built without the index has positional ids that differ
+            # between workers; serve it once, then rebuild on the next request.
+            self._stale = not indexed
+            self._checked_at = time.monotonic() if indexed else 0.0
+            self.version += 1
+            self.stats["rebuilds"] += 1
+
+    def _needs_rebuild(self) -> Tuple[bool, Tuple[int, int] | None]:
+        with self._lock:
+            fingerprint = self._current_fingerprint()
+            self._checked_at = time.monotonic()
+            current = bool(self.version) and fingerprint == self._fingerprint and not self._stale
+            return not current, fingerprint
+
+    def get(self) -> Tuple[int, List[Dict[str, Any]]]:
+        # The directory mtime/inode only changes when entries are added,
+        # removed or renamed, so one stat() per interval is enough to notice.
+        if self.version and time.monotonic() - self._checked_at < self.check_interval:
+            self.stats["hits"] += 1
+            return self.version, self.assets
+
+        needed, fingerprint = self._needs_rebuild()
+        if not needed:
+            self.stats["hits"] += 1
+            return self.version, self.assets
+
+        # While one thread rescans, the others keep serving the previous
+        # catalog; only a cold start has nothing to serve and waits.
+        if not self._build_lock.acquire(blocking=not self.version):
+            self.stats["hits"] += 1
+            return self.version, self.assets
+        try:
+            needed, fingerprint = self._needs_rebuild()
+            if needed:
+                self.stats["misses"] += 1
+                self._rebuild(fingerprint)
+            else:
+                self.stats["hits"] += 1
+        finally:
+            self._build_lock.release()
+        return self.version, self.assets
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stale = True
+            self._checked_at = 0.0
+
+    def refresh(self) -> int:
+        with self._build_lock:
+            self._rebuild(self._current_fingerprint())
+        return self.version
+
+    def derived(self, key: str, builder: Callable[[List[Dict[str, Any]]], Any]) -> Any:
+        version, assets = self.get()
+        cached = self._derived.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = builder(assets)
+        self._derived[key] = (version, value)
+        return value
+
+    @property
+    def last_modified(self) -> datetime | None:
+        if not self._fingerprint:
+            return None
+        return datetime.fromtimestamp(self._fingerprint[1] / 1e9, tz=timezone.utc)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"version": self.version, "count": len(self.assets), **self.stats}
+
+
+asset_catalog = AssetCatalog(
+    ASSET_DIR,
+    check_interval=float(os.getenv("ASSET_CATALOG_CHECK_INTERVAL", "1.0")),
+)
+
+
+PRECOMPRESS_MIN_BYTES = int(os.getenv("PRECOMPRESS_MIN_BYTES", "512"))
+
+
+class PrecompressedBody:
+    def __init__(
+        self,
+        payload: Any,
+        last_modified: datetime | None = None,
+        etag_basis: Any = None,
+        mimetype: str | None = None,
+    ) -> None:
+        # Strings are sent as they are (rendered HTML); anything else as JSON.
+        if isinstance(payload, str):
+            raw = payload.encode("utf-8")
+        else:
+            raw = (app.json.dumps(payload) + "\n").encode("utf-8")
+        # Per-process counters (e.g. the catalog version) differ between
+        # workers, so callers can hash only the shared content instead.
+        basis = raw if etag_basis is None else app.json.dumps(etag_basis).encode("utf-8")
+        digest = hashlib.sha256(basis).hexdigest()[:32]
+        self.mimetype = mimetype or app.json.mimetype
+        self.last_modified = (last_modified or datetime.now(timezone.utc)).replace(microsecond=0)
+        self.variants: Dict[str, Tuple[bytes, str]] = {"identity": (raw, digest)}
+        if len(raw) >= PRECOMPRESS_MIN_BYTES:
+            self.variants["gzip"] = (gzip.compress(raw, compresslevel=9, mtime=0), f"{digest}-gz")
+            if brotli is not None:
+                self.variants["br"] = (brotli.compress(raw), f"{digest}-br")
+
+    @classmethod
+    def from_variants(
+        cls, variants: Dict[str, Tuple[bytes, str]], mimetype: str, last_modified: datetime
+    ) -> "PrecompressedBody":
+        body = cls.__new__(cls)
+        body.variants = variants
+        body.mimetype = mimetype
+        body.last_modified = last_modified.replace(microsecond=0)
+        return body
+
+    @property
+    def etags(self) -> List[str]:
+        return [etag for _, etag in self.variants.values()]
+
+    def negotiate(self) -> str:
+        accepted = request.accept_encodings
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accepted[encoding]:
+                return encoding
+        return "identity"
+
+
+def _precompressed_response(body: PrecompressedBody):
+    encoding = body.negotiate()
+    data, etag = body.variants[encoding]
+
+    # ETags are strong and differ per encoding, but any of them proves the
+    # client already holds the current representation.
+    if request.if_none_match:
+        not_modified = any(request.if_none_match.contains(tag) for tag in body.etags)
+    else:
+        since = request.if_modified_since
+        not_modified = bool(since and body.last_modified <= since)
+
+    response = app.response_class(
+        b"" if not_modified else data,
+        status=304 if not_modified else 200,
+        mimetype=body.mimetype,
+    )
+    response.set_etag(etag)
+    response.last_modified = body.last_modified
+    response.cache_control.no_cache = True
+    response.vary.add("Accept-Encoding")
+    if encoding != "identity" and not not_modified:
+        response.content_encoding = encoding
+    return response
+
+
+MEDIA_STAT_TTL = float(os.getenv("MEDIA_STAT_TTL", "5"))
+MEDIA_STAT_CACHE_SIZE = int(os.getenv("MEDIA_STAT_CACHE_SIZE", "4096"))
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", "3600"))
+MEDIA_CHUNK_SIZE = 256 * 1024
+
+_media_stat_cache: "OrderedDict[str, Tuple[float, os.stat_result]]" = OrderedDict()
+_media_stat_lock = threading.Lock()
+
+
+def _media_stat(path: str) -> os.stat_result | None:
+    now = time.monotonic()
+    with _media_stat_lock:
+        cached = _media_stat_cache.get(path)
+        if cached and now - cached[0] < MEDIA_STAT_TTL:
+            _media_stat_cache.move_to_end(path)
+            return cached[1]
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if not S_ISREG(stat.st_mode):
+        return None
+    with _media_stat_lock:
+        _media_stat_cache[path] = (now, stat)
+        _media_stat_cache.move_to_end(path)
+        while len(_media_stat_cache) > MEDIA_STAT_CACHE_SIZE:
+            _media_stat_cache.popitem(last=False)
+    return stat
+
+
+class _FileSlice:
+    """File-like view of ``length`` bytes from the current offset.
+
+    Exposes ``fileno()`` so servers such as gunicorn can hand the slice to
+    ``os.sendfile`` through ``wsgi.file_wrapper``.
+    """
+
+    def __init__(self, handle, length: int) -> None:
+        self._handle = handle
+        self._remaining = length
+
+    def fileno(self) -> int:
+        return self._handle.fileno()
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._handle.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        self._handle.close()
+
+
+def _resolve_byte_ranges(header: str | None, size: int) -> List[Tuple[int, int]] | None:
+    parsed = parse_range_header(header) if header else None
+    if parsed is None or parsed.units != "bytes":
+        return None
+    resolved = []
+    for start, stop in parsed.ranges:
+        if start < 0:
+            start, stop = max(size + start, 0), size
+        stop = size if stop is None else min(stop, size)
+        if start < stop:
+            resolved.append((start, stop))
+    return resolved
+
+
+def _multipart_ranges(
+    path: str, ranges: List[Tuple[int, int]], size: int, mimetype: str, boundary: str
+) -> Iterator[bytes]:
+    with open(path, "rb") as handle:
+        fd = handle.fileno()
+        for start, stop in ranges:
+            yield (
+                f"\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n"
+            ).encode("latin-1")
+            offset = start
+            while offset < stop:
+                chunk = os.pread(fd, min(MEDIA_CHUNK_SIZE, stop - offset), offset)
+                if not chunk:
+                    return
+                offset += len(chunk)
+                yield chunk
+        yield f"\r\n--{boundary}--\r\n".encode("latin-1")
+
+
+def _multipart_length(
+    ranges: List[Tuple[int, int]], size: int, mimetype: str, boundary: str
+) -> int:
+    length = len(f"\r\n--{boundary}--\r\n")
+    for start, stop in ranges:
+        length += len(
+            f"\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n"
+        )
+        length += stop - start
+    return length
+
+
+def _serve_media(directory: Path, filename: str, immutable: bool = False):
+    # ``immutable`` is for locations whose names are derived from the content
+    # (upload blobs, derivatives, the static build): a filename pattern alone
+    # cannot tell a hash from a date stamp such as IMG-20240101.jpg.
+    path = safe_join(str(directory), filename)
+    stat = _media_stat(path) if path else None
+    if stat is None:
+        return jsonify({"status": "error", "message": "Not found"}), 404
+
+    size = stat.st_size
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    etag = f"{stat.st_mtime_ns:x}-{size:x}"
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{etag}"',
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": (
+            "public, max-age=31536000, immutable"
+            if immutable
+            else f"public, max-age={MEDIA_MAX_AGE}"
+        ),
+    }
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = bool(since and last_modified <= since)
+    if not_modified:
+        return app.response_class(status=304, headers=headers)
+
+    range_header = request.headers.get("Range")
+    if_range = request.if_range
+    if range_header and (if_range.etag or if_range.date):
+        # A stale If-Range validator means the client's partial copy is out of
+        # date, so the whole file is sent instead of the requested ranges.
+        if (if_range.etag and if_range.etag != etag) or (if_range.date and if_range.date < last_modified):
+            range_header = None
+
+    ranges = _resolve_byte_ranges(range_header, size)
+    if ranges is not None and not ranges:
+        headers["Content-Range"] = f"bytes */{size}"
+        return app.response_class(status=416, headers=headers)
+
+    if ranges and len(ranges) > 1:
+        boundary = hashlib.sha1(f"{etag}{time.monotonic_ns()}".encode()).hexdigest()[:24]
+        headers["Content-Length"] = str(_multipart_length(ranges, size, mimetype, boundary))
+        return app.response_class(
+            _multipart_ranges(path, ranges, size, mimetype, boundary),
+            status=206,
+            headers=headers,
+            mimetype=f"multipart/byteranges; boundary={boundary}",
+            direct_passthrough=True,
+        )
+
+    start, stop = ranges[0] if ranges else (0, size)
+    handle = open(path, "rb")
+    handle.seek(start)
+    if ranges:
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    headers["Content-Length"] = str(stop - start)
+    return app.response_class(
+        wrap_file(request.environ, _FileSlice(handle, stop - start), MEDIA_CHUNK_SIZE),
+        status=206 if ranges else 200,
+        headers=headers,
+        mimetype=mimetype,
+        direct_passthrough=True,
+    )
+
+
+STATIC_DIR = BASE_DIR / "static"
+STATIC_DIST_DIR = STATIC_DIR / "dist"
+STATIC_MANIFEST = STATIC_DIST_DIR / "manifest.json"
+# Files the service worker precaches; everything else in static/ is fetched
+# on demand.
+STATIC_PRECACHE = ("styles.css", "app.js", "workspace.js")
+CSS_STRINGS = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""")
+
+_static_manifest: Tuple[int, Dict[str, Any]] | None = None
+
+
+def _minify_css(source: str) -> str:
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    parts = CSS_STRINGS.split(source)
+    for index in range(0, len(parts), 2):
+        chunk = re.sub(r"\s+", " ", parts[index])
+        chunk = re.sub(r" ?([{};,>]) ?", r"\1", chunk)
+        parts[index] = chunk.replace(": ", ":").replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def _minify_js(source: str) -> str:
+    # Whitespace and comment stripping only. Newlines are kept so automatic
+    # semicolon insertion behaves exactly as in the source, and lines inside
+    # template literals are left untouched.
+    lines = []
+    in_template = False
+    for line in source.splitlines():
+        if in_template:
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith("//"):
+                lines.append(stripped)
+        in_template ^= (line.count("`") - line.count("\\`")) % 2 == 1
+    return "\n".join(lines) + "\n"
+
+
+MINIFIERS: Dict[str, Callable[[str], str]] = {".css": _minify_css, ".js": _minify_js}
+
+
+def static_manifest() -> Dict[str, Any]:
+    """The current build manifest, re-read when ``build-static`` rewrites it."""
+    global _static_manifest
+    stat = _media_stat(str(STATIC_MANIFEST))
+    if stat is None:
+        return {"version": "dev", "files": {}}
+    cached = _static_manifest
+    if cached and cached[0] == stat.st_mtime_ns:
+        return cached[1]
+    try:
+        manifest = json.loads(STATIC_MANIFEST.read_text())
+    except (OSError, ValueError):
+        return {"version": "dev", "files": {}}
+    _static_manifest = (stat.st_mtime_ns, manifest)
+    return manifest
+
+
+def static_url(name: str) -> str:
+    hashed = static_manifest()["files"].get(name)
+    return f"/static/{hashed or name}"
+
+
+def _service_worker(manifest: Dict[str, Any]) -> str:
+    files = manifest["files"]
+    return render_template(
+        "sw.js",
+        version=manifest["version"],
+        precache=[f"/static/{files.get(name, name)}" for name in STATIC_PRECACHE],
+    )
+
+
+def build_static() -> Dict[str, Any]:
+    """Minify and fingerprint static/ into static/dist/ and write the manifest.
+
+    Files from the previous build are kept so pages rendered before a deploy
+    can still load their assets; older builds are removed.
+    """
+    STATIC_DIST_DIR.mkdir(parents=True, exist_ok=True)
+    previous = static_manifest()
+    files: Dict[str, str] = {}
+    sizes: Dict[str, Tuple[int, int]] = {}
+    for path in sorted(STATIC_DIR.iterdir()):
+        if not path.is_file() or path.name == "sw.js":
+            continue
+        data = path.read_bytes()
+        minify = MINIFIERS.get(path.suffix)
+        output = minify(data.decode("utf-8")).encode("utf-8") if minify else data
+        digest = hashlib.sha256(output).hexdigest()[:12]
+        target = STATIC_DIST_DIR / f"{path.stem}.{digest}{path.suffix}"
+        if not target.exists():
+            tmp = target.with_name(f".{target.name}.tmp")
+            tmp.write_bytes(output)
+            os.replace(tmp, target)
+        files[path.name] = f"dist/{target.name}"
+        sizes[path.name] = (len(data), len(output))
+
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:12]
+    manifest = {"version": version, "files": files}
+    keep = {Path(name).name for name in list(files.values()) + list(previous["files"].values())}
+    for path in STATIC_DIST_DIR.iterdir():
+        if path.name not in keep and path.name not in {STATIC_MANIFEST.name, "sw.js"}:
+            path.unlink(missing_ok=True)
+
+    (STATIC_DIST_DIR / "sw.js").write_text(_service_worker(manifest))
+    tmp = STATIC_MANIFEST.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp, STATIC_MANIFEST)
+    return {"manifest": manifest, "sizes": sizes}
+
+
+@app.cli.command("build-static")
+def build_static_command() -> None:
+    """Minify and fingerprint static files and regenerate the service worker."""
+    result = build_static()
+    for name, (before, after) in result["sizes"].items():
+        print(f"{name:<20} {before:>8} -> {after:>8}  {result['manifest']['files'][name]}")
+    print(f"Build {result['manifest']['version']} written to {STATIC_MANIFEST}")
+
+
+app.jinja_env.globals["static_url"] = static_url
+
+
+@app.route("/static/dist/<path:filename>")
+def serve_static_dist(filename: str):
+    return _serve_media(STATIC_DIST_DIR, filename, immutable=filename != STATIC_MANIFEST.name)
+
+
+@app.route("/sw.js")
+def service_worker():
+    # Served from the root so its scope covers the whole site. Browsers
+    # re-check it on every navigation, so it must never be cached itself.
+    built = STATIC_DIST_DIR / "sw.js"
+    manifest = static_manifest()
+    if manifest["version"] != "dev" and built.exists():
+        body = built.read_text()
+    else:
+        body = _service_worker(manifest)
+    response = Response(body, mimetype="application/javascript")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR / 'app.db'}")
-engine = create_engine(DATABASE_URL, future=True)
+if DATABASE_URL.startswith("postgres://"):
+    # Render/Heroku style URLs use a scheme SQLAlchemy 2 no longer accepts.
+    DATABASE_URL = "postgresql://" + DATABASE_URL[len("postgres://"):]
+
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, "true" if default else "false").lower() in {"1", "true", "yes"}
+
+
+class PoolStats:
+    def __init__(self) -> None:
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidated = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.slow_queries: "deque[Dict[str, Any]]" = deque(maxlen=50)
+        self.lock = threading.Lock()
+
+    def record_wait(self, seconds: float) -> None:
+        with self.lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "pool": type(pool).__name__,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidated": self.invalidated,
+            "wait_avg_ms": round(self.wait_total / self.waits * 1000, 3) if self.waits else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "slow_query_threshold_ms": DB_SLOW_QUERY_MS,
+            "slow_queries": list(self.slow_queries),
+        }
+        if isinstance(pool, QueuePool):
+            data.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+        return data
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    if url.startswith("sqlite"):
+        if ":memory:" in url or url.rstrip("/") == "sqlite:":
+            return {"connect_args": {"check_same_thread": False}}
+        # Pooled connections may be checked out from different threads,
+        # which sqlite3 refuses by default.
+        return {
+            "poolclass": TimedQueuePool,
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "5")),
+            "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            "connect_args": {"check_same_thread": False, "timeout": 15},
+        }
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", True),
+    }
+
+
+engine = create_engine(DATABASE_URL, future=True, **_engine_options(DATABASE_URL))
 metadata = MetaData()
 
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record) -> None:
+    pool_stats.connects += 1
+    if engine.dialect.name == "sqlite" and _env_flag("SQLITE_WAL", True):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    pool_stats.checkouts += 1
+
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception) -> None:
+    pool_stats.invalidated += 1
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "handle_error")
+def _query_failed(context) -> None:
+    started = context.connection.info.get("query_started") if context.connection else None
+    if started:
+        started.pop()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info["query_started"].pop()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if INSTRUMENTATION_ENABLED and has_request_context():
+        _record_query(statement, elapsed_ms)
+    if elapsed_ms >= DB_SLOW_QUERY_MS:
+        pool_stats.slow_queries.append(
+            {
+                "statement": " ".join(statement.split())[:500],
+                "duration_ms": round(elapsed_ms, 3),
+                "at": datetime.utcnow().isoformat(timespec="seconds"),
+            }
+        )
+
+
 users = Table(
     "users",
     metadata,
@@ -138,6 +1236,7 @@ subscriptions = Table(
     Column("status", String(50), nullable=False),
     Column("renewal_date", Date, nullable=True),
 )
+Index("ix_subscriptions_user_id_id", subscriptions.c.user_id, subscriptions.c.id)
 
 events = Table(
     "events",
@@ -148,6 +1247,8 @@ events = Table(
     Column("event_date", Date, nullable=False),
     Column("location", String(255), nullable=True),
 )
+Index("ix_events_user_id_event_date", events.c.user_id, events.c.event_date, events.c.id)
+Index("ix_events_event_date", events.c.event_date)
 
 performances = Table(
     "performances",
@@ -158,6 +1259,26 @@ performances = Table(
     Column("performance_date", Date, nullable=False),
     Column("fee", Float, nullable=False, default=0),
 )
+Index(
+    "ix_performances_user_id_performance_date",
+    performances.c.user_id,
+    performances.c.performance_date,
+    performances.c.id,
+)
+Index("ix_performances_performance_date", performances.c.performance_date)
+
+# Monthly fee totals per user, kept current by add_performance. user_id 0
+# holds the agency-wide totals, so dashboards never aggregate performances.
+AGENCY_ROLLUP_ID = 0
+
+earnings_monthly = Table(
+    "earnings_monthly",
+    metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("month", Date, primary_key=True),
+    Column("total", Float, nullable=False, default=0),
+    Column("performance_count", Integer, nullable=False, default=0),
+)
 
 media_assets = Table(
     "media_assets",
@@ -166,8 +1287,15 @@ media_assets = Table(
     Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
     Column("media_type", String(20), nullable=False),
     Column("url", String(500), nullable=False),
-    Column("uploaded_at", DateTime, default=datetime.utcnow),
+    Column("uploaded_at", DateTime, default=datetime.utcnow, server_default=text("CURRENT_TIMESTAMP")),
 )
+Index(
+    "ix_media_assets_user_id_uploaded_at",
+    media_assets.c.user_id,
+    media_assets.c.uploaded_at,
+    media_assets.c.id,
+)
+Index("ix_media_assets_user_id_url", media_assets.c.user_id, media_assets.c.url)
 
 messages = Table(
     "messages",
@@ -176,14 +1304,63 @@ messages = Table(
     Column("sender_id", Integer, ForeignKey("users.id"), nullable=False),
     Column("recipient_id", Integer, ForeignKey("users.id"), nullable=True),
     Column("body", Text, nullable=False),
-    Column("created_at", DateTime, default=datetime.utcnow),
-    Column("is_to_moderator", Boolean, default=False),
+    Column("created_at", DateTime, default=datetime.utcnow, server_default=text("CURRENT_TIMESTAMP")),
+    Column("is_to_moderator", Boolean, default=False, server_default=text("FALSE")),
+)
+Index("ix_messages_recipient_id_id", messages.c.recipient_id, messages.c.id)
+Index("ix_messages_sender_id_id", messages.c.sender_id, messages.c.id)
+Index(
+    "ix_messages_is_to_moderator_created_at",
+    messages.c.is_to_moderator,
+    messages.c.created_at,
+    messages.c.id,
+)
+
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", Text, nullable=False),
+    Column("applied_at", DateTime),
+)
+
+moderator_conversations = Table(
+    "moderator_conversations",
+    metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("last_message_id", Integer, nullable=False, index=True),
+    Column("last_message_at", DateTime),
+    Column("last_body", Text),
+    Column("message_count", Integer, nullable=False, default=0),
+    Column("unread_count", Integer, nullable=False, default=0),
+    Column("last_read_message_id", Integer),
+    Column("read_by", Integer, ForeignKey("users.id")),
+)
+
+# Bumped by every write that changes what a workspace section renders; the
+# rendered fragment cache is keyed on it.
+workspace_versions = Table(
+    "workspace_versions",
+    metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("section", String(20), primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+)
+
+# Shared invalidation stamps for per-process caches that are not per user,
+# such as booking availability.
+cache_versions = Table(
+    "cache_versions",
+    metadata,
+    Column("name", String(50), primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
 )
 
 inquiries = Table(
     "inquiries",
     metadata,
     Column("id", Integer, primary_key=True),
+    Column("inquiry_key", String(64), unique=True),
     Column("client_name", String(255), nullable=False),
     Column("email", String(255), nullable=False),
     Column("event_type", String(255), nullable=False),
@@ -192,13 +1369,27 @@ inquiries = Table(
     Column("created_at", DateTime, default=datetime.utcnow),
 )
 
+asset_index = Table(
+    "asset_index",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("path", String(500), unique=True, nullable=False),
+    Column("content_hash", String(64), nullable=False, index=True),
+    Column("size_bytes", BigInteger, nullable=False),
+    Column("mtime_ns", BigInteger, nullable=False),
+    Column("asset_type", String(20), nullable=False),
+    Column("width", Integer, nullable=True),
+    Column("height", Integer, nullable=True),
+    Column("duration", Float, nullable=True),
+    Column("codec", String(50), nullable=True),
+    Column("indexed_at", DateTime, default=datetime.utcnow),
+)
+
 
 def init_db() -> None:
-    metadata.create_all(engine)
+    migrate_schema()
 
     with engine.begin() as conn:
-        _ensure_schema(conn)
-
         def _insert_user(email: str, password: str, name: str, role: str, hero: str) -> int | None:
             created_at = datetime.utcnow()
             if _has_column(conn, "users", "username"):
@@ -220,7 +1411,7 @@ def init_db() -> None:
                     ),
                     {
                         "email": email,
-                        "password_hash": generate_password_hash(password),
+                        "password_hash": generate_password_hash(password, PASSWORD_HASH_METHOD),
                         "name": name,
                         "role": role,
                         "hero_video_url": hero,
@@ -243,7 +1434,7 @@ def init_db() -> None:
             result = conn.execute(
                 users.insert().values(
                     email=email,
-                    password_hash=generate_password_hash(password),
+                    password_hash=generate_password_hash(password, PASSWORD_HASH_METHOD),
                     name=name,
                     role=role,
                     hero_video_url=hero,
@@ -344,6 +1535,7 @@ def init_db() -> None:
                 fee=850.0,
             )
         )
+        _record_earnings(conn, user_id, date.today() - timedelta(days=7), 850.0)
         conn.execute(
             messages.insert().values(
                 sender_id=moderator_id,
@@ -381,155 +1573,519 @@ def _has_column(conn, table_name: str, column_name: str) -> bool:
     return result is not None
 
 
-def _ensure_schema(conn) -> None:
-    if _table_exists(conn, "users"):
-        if not _has_column(conn, "users", "email"):
-            conn.execute(text("ALTER TABLE users ADD COLUMN email TEXT"))
-            conn.execute(text("UPDATE users SET email = 'user' || id || '@abagency.com' WHERE email IS NULL"))
-        if not _has_column(conn, "users", "name"):
-            conn.execute(text("ALTER TABLE users ADD COLUMN name TEXT"))
-        if _has_column(conn, "users", "full_name"):
-            conn.execute(text("UPDATE users SET name = COALESCE(name, full_name) WHERE name IS NULL"))
-        if not _has_column(conn, "users", "role"):
-            conn.execute(text("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'community'"))
-        if not _has_column(conn, "users", "hero_video_url"):
-            conn.execute(text("ALTER TABLE users ADD COLUMN hero_video_url TEXT"))
-        if _has_column(conn, "users", "username"):
-            conn.execute(text("ALTER TABLE users ALTER COLUMN username SET DEFAULT 'user'"))
-            conn.execute(
-                text(
-                    """
-                    UPDATE users
-                    SET username = COALESCE(username, email, 'user')
-                    WHERE username IS NULL
-                    """
-                )
-            )
+MIGRATION_LOCK_ID = 7_310_015
+LEGACY_COPY_BATCH = int(os.getenv("LEGACY_COPY_BATCH", "5000"))
+
+# (version, name, function). Versions are applied in order, once, and recorded
+# in ``schema_migrations``; a boot with nothing pending costs one query. The
+# baseline builds the full current schema on a fresh database, so later
+# migrations must be idempotent (``IF NOT EXISTS``, ``checkfirst=True``).
+MIGRATIONS: List[Tuple[int, str, Callable[[Any], None]]] = []
 
-    if _table_exists(conn, "user_profiles") and not _table_exists(conn, "profiles"):
+
+def migration(version: int, name: str) -> Callable[[Callable[[Any], None]], Callable[[Any], None]]:
+    def register(func: Callable[[Any], None]) -> Callable[[Any], None]:
+        MIGRATIONS.append((version, name, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+
+    return register
+
+
+@migration(1, "legacy users columns")
+def _migrate_legacy_users(conn) -> None:
+    if not _table_exists(conn, "users"):
+        return
+    if not _has_column(conn, "users", "email"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN email TEXT"))
+        conn.execute(text("UPDATE users SET email = 'user' || id || '@abagency.com' WHERE email IS NULL"))
+    if not _has_column(conn, "users", "name"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN name TEXT"))
+    if _has_column(conn, "users", "full_name"):
+        conn.execute(text("UPDATE users SET name = COALESCE(name, full_name) WHERE name IS NULL"))
+    if not _has_column(conn, "users", "role"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'community'"))
+    if not _has_column(conn, "users", "hero_video_url"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN hero_video_url TEXT"))
+    if _has_column(conn, "users", "username"):
+        conn.execute(text("ALTER TABLE users ALTER COLUMN username SET DEFAULT 'user'"))
         conn.execute(
             text(
                 """
-                CREATE TABLE profiles (
-                  user_id INTEGER PRIMARY KEY,
-                  bio TEXT,
-                  phone TEXT,
-                  location TEXT,
-                  website TEXT
-                )
+                UPDATE users
+                SET username = COALESCE(username, email, 'user')
+                WHERE username IS NULL
                 """
             )
         )
-        conn.execute(
-            text(
-                """
-                INSERT INTO profiles (user_id, bio, phone, location, website)
-                SELECT user_id, bio, phone, location, website FROM user_profiles
-                """
+
+
+@migration(2, "baseline tables")
+def _migrate_baseline(conn) -> None:
+    metadata.create_all(conn)
+
+
+LEGACY_TABLES = (
+    # legacy table, target table, target columns, source columns, batch key
+    (
+        "user_profiles",
+        "profiles",
+        "user_id, bio, phone, location, website",
+        "user_id, bio, phone, location, website",
+        "user_id",
+    ),
+    (
+        "user_events",
+        "events",
+        "user_id, title, event_date, location",
+        "user_id, title, event_date, notes",
+        "id",
+    ),
+    # INSERT ... SELECT gets no Python-side defaults, so columns the legacy
+    # tables lack are filled here.
+    (
+        "user_media",
+        "media_assets",
+        "user_id, media_type, url, uploaded_at",
+        "user_id, media_type, url, CURRENT_TIMESTAMP",
+        "id",
+    ),
+    (
+        "user_performances",
+        "performances",
+        "user_id, title, performance_date, fee",
+        "user_id, performance_name, performance_date, fee_earned",
+        "id",
+    ),
+    (
+        "chat_messages",
+        "messages",
+        "sender_id, recipient_id, body, created_at, is_to_moderator",
+        "sender_id, recipient_id, message, COALESCE(created_at, CURRENT_TIMESTAMP), FALSE",
+        "id",
+    ),
+)
+
+
+@migration(3, "copy legacy tables")
+def _migrate_legacy_tables(conn) -> None:
+    # Targets are created by the baseline, so a legacy table is copied when
+    # its target is still empty rather than only when the target is missing.
+    for legacy, target, columns, source, key in LEGACY_TABLES:
+        if not _table_exists(conn, legacy) or conn.execute(text(f"SELECT 1 FROM {target} LIMIT 1")).first():
+            continue
+        copy = f"INSERT INTO {target} ({columns}) SELECT {source} FROM {legacy}"
+        if not _has_column(conn, legacy, key):
+            conn.execute(text(copy))
+            continue
+        low, high = conn.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {legacy}")).first()
+        start = low
+        while start is not None and start <= high:
+            conn.execute(
+                text(f"{copy} WHERE {key} >= :start AND {key} < :stop"),
+                {"start": start, "stop": start + LEGACY_COPY_BATCH},
             )
-        )
+            start += LEGACY_COPY_BATCH
+
 
-    if _table_exists(conn, "user_events") and not _table_exists(conn, "events"):
+@migration(4, "inquiry keys")
+def _migrate_inquiry_keys(conn) -> None:
+    if not _has_column(conn, "inquiries", "inquiry_key"):
+        conn.execute(text("ALTER TABLE inquiries ADD COLUMN inquiry_key TEXT"))
         conn.execute(
-            text(
-                """
-                CREATE TABLE events (
-                  id SERIAL PRIMARY KEY,
-                  user_id INTEGER,
-                  title TEXT NOT NULL,
-                  event_date DATE NOT NULL,
-                  location TEXT
-                )
-                """
-            )
+            text("CREATE UNIQUE INDEX IF NOT EXISTS inquiries_inquiry_key_key ON inquiries (inquiry_key)")
         )
-        conn.execute(
-            text(
-                """
-                INSERT INTO events (user_id, title, event_date, location)
-                SELECT user_id, title, event_date, notes FROM user_events
-                """
-            )
+
+
+@migration(5, "message indexes")
+def _migrate_message_indexes(conn) -> None:
+    conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_messages_recipient_id_id ON messages (recipient_id, id)")
+    )
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_messages_sender_id_id ON messages (sender_id, id)"))
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_messages_is_to_moderator_created_at "
+            "ON messages (is_to_moderator, created_at, id)"
         )
+    )
 
-    if _table_exists(conn, "user_media") and not _table_exists(conn, "media_assets"):
-        conn.execute(
-            text(
-                """
-                CREATE TABLE media_assets (
-                  id SERIAL PRIMARY KEY,
-                  user_id INTEGER,
-                  media_type TEXT NOT NULL,
-                  url TEXT NOT NULL,
-                  uploaded_at TIMESTAMPTZ DEFAULT NOW()
-                )
-                """
-            )
+
+@migration(6, "moderator conversations backfill")
+def _migrate_moderator_conversations(conn) -> None:
+    if conn.execute(text("SELECT 1 FROM moderator_conversations LIMIT 1")).first():
+        return
+    # Every message sent before the inbox existed counts as unread.
+    conn.execute(
+        text(
+            """
+            INSERT INTO moderator_conversations
+              (user_id, last_message_id, last_message_at, last_body, message_count, unread_count)
+            SELECT m.sender_id, m.id, m.created_at, m.body, agg.total, agg.total
+            FROM (
+              SELECT sender_id, MAX(id) AS last_id, COUNT(*) AS total
+              FROM messages
+              WHERE is_to_moderator
+              GROUP BY sender_id
+            ) agg
+            JOIN messages m ON m.id = agg.last_id
+            """
         )
-        conn.execute(
-            text(
-                """
-                INSERT INTO media_assets (user_id, media_type, url)
-                SELECT user_id, media_type, url FROM user_media
-                """
-            )
+    )
+
+
+@migration(7, "workspace indexes")
+def _migrate_workspace_indexes(conn) -> None:
+    # One index per workspace section, matching its WHERE user_id = ? ORDER
+    # BY shape so each section is a bounded index range scan.
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_subscriptions_user_id_id ON subscriptions (user_id, id)",
+        "CREATE INDEX IF NOT EXISTS ix_events_user_id_event_date ON events (user_id, event_date, id)",
+        "CREATE INDEX IF NOT EXISTS ix_performances_user_id_performance_date "
+        "ON performances (user_id, performance_date, id)",
+        "CREATE INDEX IF NOT EXISTS ix_media_assets_user_id_uploaded_at ON media_assets (user_id, uploaded_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_media_assets_user_id_url ON media_assets (user_id, url)",
+    ):
+        conn.execute(text(statement))
+
+
+@migration(8, "booking date indexes")
+def _migrate_booking_indexes(conn) -> None:
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_events_event_date ON events (event_date)"))
+    conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_performances_performance_date ON performances (performance_date)")
+    )
+
+
+@migration(9, "earnings rollups")
+def _migrate_earnings_rollups(conn) -> None:
+    earnings_monthly.create(conn, checkfirst=True)
+    rebuild_earnings_rollups(conn)
+
+
+@migration(10, "workspace versions")
+def _migrate_workspace_versions(conn) -> None:
+    workspace_versions.create(conn, checkfirst=True)
+
+
+@migration(11, "cache versions")
+def _migrate_cache_versions(conn) -> None:
+    cache_versions.create(conn, checkfirst=True)
+
+
+@migration(12, "legacy copy defaults")
+def _migrate_legacy_copy_defaults(conn) -> None:
+    # Rows copied by migration 3 before it filled these in.
+    conn.execute(
+        media_assets.update().where(media_assets.c.uploaded_at.is_(None)).values(uploaded_at=func.current_timestamp())
+    )
+    conn.execute(messages.update().where(messages.c.created_at.is_(None)).values(created_at=func.current_timestamp()))
+    conn.execute(messages.update().where(messages.c.is_to_moderator.is_(None)).values(is_to_moderator=False))
+
+
+def rebuild_earnings_rollups(conn) -> None:
+    """Recompute ``earnings_monthly`` from ``performances`` in two statements."""
+    if engine.dialect.name == "postgresql":
+        month = "CAST(date_trunc('month', performance_date) AS DATE)"
+    else:
+        month = "date(performance_date, 'start of month')"
+    conn.execute(earnings_monthly.delete())
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO earnings_monthly (user_id, month, total, performance_count)
+            SELECT user_id, {month}, SUM(fee), COUNT(*)
+            FROM performances
+            GROUP BY user_id, {month}
+            """
         )
+    )
+    conn.execute(
+        text(
+            """
+            INSERT INTO earnings_monthly (user_id, month, total, performance_count)
+            SELECT :agency, month, SUM(total), SUM(performance_count)
+            FROM earnings_monthly
+            GROUP BY month
+            """
+        ),
+        {"agency": AGENCY_ROLLUP_ID},
+    )
 
-    if _table_exists(conn, "user_performances") and not _table_exists(conn, "performances"):
+
+def migrate_schema() -> List[int]:
+    """Apply pending migrations and return the versions that ran."""
+    with engine.begin() as conn:
         conn.execute(
             text(
                 """
-                CREATE TABLE performances (
-                  id SERIAL PRIMARY KEY,
-                  user_id INTEGER,
-                  title TEXT NOT NULL,
-                  performance_date DATE NOT NULL,
-                  fee NUMERIC(10,2) DEFAULT 0
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                  version INTEGER PRIMARY KEY,
+                  name TEXT NOT NULL,
+                  applied_at TIMESTAMP
                 )
                 """
             )
         )
-        conn.execute(
-            text(
-                """
-                INSERT INTO performances (user_id, title, performance_date, fee)
-                SELECT user_id, performance_name, performance_date, fee_earned FROM user_performances
-                """
-            )
-        )
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    pending = [item for item in MIGRATIONS if item[0] not in applied]
+    if not pending:
+        return []
 
-    if _table_exists(conn, "chat_messages") and not _table_exists(conn, "messages"):
-        conn.execute(
-            text(
-                """
-                CREATE TABLE messages (
-                  id SERIAL PRIMARY KEY,
-                  sender_id INTEGER,
-                  recipient_id INTEGER,
-                  body TEXT NOT NULL,
-                  created_at TIMESTAMPTZ DEFAULT NOW(),
-                  is_to_moderator BOOLEAN DEFAULT FALSE
+    # SQLite has no advisory locks; workers booting together on the same file
+    # take turns through a lock file next to it instead.
+    lock_fd = None
+    if engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        lock_fd = os.open(f"{engine.url.database}.migrate.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+    ran: List[int] = []
+    try:
+        for version, name, func in pending:
+            with engine.begin() as conn:
+                if engine.dialect.name == "postgresql":
+                    # Serializes workers booting at the same time during a deploy.
+                    conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+                if conn.execute(
+                    select(schema_migrations.c.version).where(schema_migrations.c.version == version)
+                ).first():
+                    continue
+                func(conn)
+                conn.execute(
+                    schema_migrations.insert().values(version=version, name=name, applied_at=datetime.utcnow())
                 )
-                """
-            )
-        )
-        conn.execute(
-            text(
-                """
-                INSERT INTO messages (sender_id, recipient_id, body, created_at)
-                SELECT sender_id, recipient_id, message, created_at FROM chat_messages
-                """
-            )
-        )
+            ran.append(version)
+    finally:
+        if lock_fd is not None:
+            os.close(lock_fd)
+    return ran
+
+
+@app.cli.command("migrate")
+def migrate_command() -> None:
+    """Apply pending schema migrations."""
+    ran = migrate_schema()
+    print(f"Applied migrations: {ran}" if ran else "Schema is up to date.")
+
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+
+_user_cache: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def invalidate_user(user_id: int) -> None:
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+    if g and g.get("current_user") and g.current_user["id"] == user_id:
+        g.pop("current_user")
 
 
 def get_current_user() -> Dict[str, Any] | None:
+    if "current_user" in g:
+        return g.current_user
+
     user_id = session.get("user_id")
     if not user_id:
+        g.current_user = None
         return None
+
+    now = time.monotonic()
+    with _user_cache_lock:
+        cached = _user_cache.get(user_id)
+        if cached and now - cached[0] < USER_CACHE_TTL:
+            _user_cache.move_to_end(user_id)
+            g.current_user = cached[1]
+            return cached[1]
+
     with engine.begin() as conn:
         row = conn.execute(select(users).where(users.c.id == user_id)).mappings().first()
-        return dict(row) if row else None
+    user = dict(row) if row else None
+    if user:
+        with _user_cache_lock:
+            _user_cache[user_id] = (now, user)
+            _user_cache.move_to_end(user_id)
+            while len(_user_cache) > USER_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+    g.current_user = user
+    return user
+
+
+WORKSPACE_PAGE_SIZE = int(os.getenv("WORKSPACE_PAGE_SIZE", "50"))
+WORKSPACE_MAX_PAGE_SIZE = int(os.getenv("WORKSPACE_MAX_PAGE_SIZE", "200"))
+
+
+def _workspace_sections(user_id: int) -> Dict[str, Tuple[Table, Any, List[Any]]]:
+    return {
+        "profile": (profiles, profiles.c.user_id == user_id, [profiles.c.user_id]),
+        "subscription": (
+            subscriptions,
+            subscriptions.c.user_id == user_id,
+            [subscriptions.c.id],
+        ),
+        "events": (events, events.c.user_id == user_id, [events.c.event_date, events.c.id]),
+        "performances": (
+            performances,
+            performances.c.user_id == user_id,
+            [performances.c.performance_date.desc(), performances.c.id.desc()],
+        ),
+        "media": (
+            media_assets,
+            media_assets.c.user_id == user_id,
+            [media_assets.c.uploaded_at.desc(), media_assets.c.id.desc()],
+        ),
+        "messages": (
+            messages,
+            (messages.c.sender_id == user_id) | (messages.c.recipient_id == user_id),
+            [messages.c.created_at.desc(), messages.c.id.desc()],
+        ),
+    }
+
+
+WORKSPACE_SINGLE_ROW_SECTIONS = {"profile", "subscription"}
+
+
+def _section_json(table: Table, where: Any, order_by: List[Any], limit: int, offset: int):
+    # Each section becomes a JSON array in a scalar subquery, so all of them
+    # come back as one row from one statement. _pos carries the ordering
+    # through the aggregate.
+    inner = (
+        select(table, func.row_number().over(order_by=order_by).label("_pos"))
+        .where(where)
+        .order_by(*order_by)
+        .limit(limit)
+        .offset(offset)
+        .subquery()
+    )
+    postgres = engine.dialect.name == "postgresql"
+    build_object = func.json_build_object if postgres else func.json_object
+    aggregate = func.json_agg if postgres else func.json_group_array
+    pairs = []
+    for column in list(table.columns) + [inner.c._pos]:
+        pairs.extend([literal_column(f"'{column.name}'"), inner.c[column.name]])
+    return select(aggregate(build_object(*pairs))).select_from(inner).scalar_subquery()
+
+
+def _normalize_section_item(table: Table, item: Dict[str, Any]) -> Dict[str, Any]:
+    # SQLite's json_object has no boolean or timestamp types: booleans come
+    # back as 0/1 and timestamps as "YYYY-MM-DD HH:MM:SS". Coerce both to
+    # what the JSON API returns for the same rows (true/false, ISO 8601).
+    for column in table.columns:
+        value = item.get(column.name)
+        if value is None:
+            continue
+        if isinstance(column.type, Boolean):
+            item[column.name] = bool(value)
+        elif isinstance(column.type, DateTime) and isinstance(value, str):
+            item[column.name] = datetime.fromisoformat(value).isoformat()
+    return item
+
+
+def load_workspace(
+    user_id: int,
+    names: List[str] | None = None,
+    limit: int = WORKSPACE_PAGE_SIZE,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    sections = _workspace_sections(user_id)
+    names = names or list(sections)
+    columns = []
+    for name in names:
+        table, where, order_by = sections[name]
+        if name in WORKSPACE_SINGLE_ROW_SECTIONS:
+            columns.append(_section_json(table, where, order_by, 1, 0).label(name))
+        else:
+            columns.append(_section_json(table, where, order_by, limit + 1, offset).label(name))
+
+    with engine.connect() as conn:
+        row = conn.execute(select(*columns)).mappings().first()
+
+    data: Dict[str, Any] = {}
+    for name in names:
+        raw = row[name]
+        items = json.loads(raw) if isinstance(raw, str) else list(raw or [])
+        items.sort(key=lambda item: item.pop("_pos"))
+        items = [_normalize_section_item(sections[name][0], item) for item in items]
+        if name in WORKSPACE_SINGLE_ROW_SECTIONS:
+            data[name] = items[0] if items else None
+        else:
+            has_more = len(items) > limit
+            data[name] = items[:limit]
+            data[f"{name}_next_offset"] = offset + limit if has_more else None
+    return data
+
+
+WORKSPACE_FRAGMENTS = ("profile", "subscription", "events", "performances", "media", "messages")
+WORKSPACE_FRAGMENT_CACHE_SIZE = int(os.getenv("WORKSPACE_FRAGMENT_CACHE_SIZE", "2048"))
+# Upper bound on staleness for changes no endpoint bumps, such as media
+# derivatives finishing in the background or subscriptions edited in the DB.
+WORKSPACE_FRAGMENT_TTL = float(os.getenv("WORKSPACE_FRAGMENT_TTL", "300"))
+
+_fragment_cache: "OrderedDict[Tuple[int, str], Tuple[int, float, Markup]]" = OrderedDict()
+_fragment_cache_lock = threading.Lock()
+
+
+def bump_workspace(conn, user_id: int, *sections: str) -> None:
+    """Invalidate rendered fragments of ``user_id`` in every worker.
+
+    Runs inside the caller's write transaction so the new version is visible
+    exactly when the data it describes is.
+    """
+    for section in sections:
+        stmt = _upsert_insert(workspace_versions).values(user_id=user_id, section=section, version=1)
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[workspace_versions.c.user_id, workspace_versions.c.section],
+                set_={"version": workspace_versions.c.version + 1},
+            )
+        )
+
+
+def _render_fragment(section: str, data: Dict[str, Any]) -> Markup:
+    context: Dict[str, Any] = {
+        "profile": data.get("profile"),
+        "subscription": data.get("subscription"),
+        "user_events": data.get("events"),
+        "user_performances": data.get("performances"),
+        "user_media": data.get("media"),
+        "chat_messages": data.get("messages"),
+        "next_offset": data.get(f"{section}_next_offset"),
+    }
+    return Markup(render_template(f"workspace/_{section}.html", **context))
+
+
+def workspace_fragments(user_id: int, names: Tuple[str, ...] = WORKSPACE_FRAGMENTS) -> Dict[str, Markup]:
+    """Rendered workspace sections, re-querying and re-rendering only stale ones."""
+    with engine.connect() as conn:
+        versions = dict(
+            conn.execute(
+                select(workspace_versions.c.section, workspace_versions.c.version).where(
+                    workspace_versions.c.user_id == user_id
+                )
+            ).all()
+        )
+
+    now = time.monotonic()
+    fragments: Dict[str, Markup] = {}
+    with _fragment_cache_lock:
+        for name in names:
+            cached = _fragment_cache.get((user_id, name))
+            if cached and cached[0] == versions.get(name, 0) and now - cached[1] < WORKSPACE_FRAGMENT_TTL:
+                _fragment_cache.move_to_end((user_id, name))
+                fragments[name] = cached[2]
+
+    stale = [name for name in names if name not in fragments]
+    if stale:
+        data = load_workspace(user_id, stale)
+        for name in stale:
+            fragments[name] = _render_fragment(name, data)
+        with _fragment_cache_lock:
+            for name in stale:
+                _fragment_cache[(user_id, name)] = (versions.get(name, 0), now, fragments[name])
+                _fragment_cache.move_to_end((user_id, name))
+            while len(_fragment_cache) > WORKSPACE_FRAGMENT_CACHE_SIZE:
+                _fragment_cache.popitem(last=False)
+    return fragments
 
 
 def _sqlite_connection():
@@ -557,22 +2113,36 @@ def _init_sqlite():
     conn.close()
 
 
-def _send_inquiry_email(payload: Dict[str, Any]) -> None:
+OUTBOX_DIR = Path(os.getenv("OUTBOX_DIR", BASE_DIR / "outbox"))
+SMTP_MAX_ATTEMPTS = int(os.getenv("SMTP_MAX_ATTEMPTS", "8"))
+SMTP_RETRY_BASE = float(os.getenv("SMTP_RETRY_BASE", "5"))
+SMTP_RETRY_MAX = float(os.getenv("SMTP_RETRY_MAX", "900"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+MAIL_QUEUE_POLL = 30.0
+MAIL_CLAIM_TIMEOUT = 300.0
+
+
+def _smtp_settings() -> Dict[str, Any] | None:
     smtp_host = os.getenv("SMTP_HOST")
     if not smtp_host:
-        return
-
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
+        return None
     smtp_user = os.getenv("SMTP_USERNAME", "")
-    smtp_pass = os.getenv("SMTP_PASSWORD", "")
-    smtp_use_tls = os.getenv("SMTP_USE_TLS", "true").lower() in {"1", "true", "yes"}
-    smtp_from = os.getenv("SMTP_FROM", smtp_user or "no-reply@abagency.local")
-    smtp_to = os.getenv("SMTP_TO", "roum1990@hotmail.fr")
+    return {
+        "host": smtp_host,
+        "port": int(os.getenv("SMTP_PORT", "587")),
+        "user": smtp_user,
+        "password": os.getenv("SMTP_PASSWORD", ""),
+        "use_tls": os.getenv("SMTP_USE_TLS", "true").lower() in {"1", "true", "yes"},
+        "from": os.getenv("SMTP_FROM", smtp_user or "no-reply@abagency.local"),
+        "to": os.getenv("SMTP_TO", "roum1990@hotmail.fr"),
+    }
+
 
+def _inquiry_email(payload: Dict[str, Any], settings: Dict[str, Any]) -> EmailMessage:
     message = EmailMessage()
     message["Subject"] = "Nouvelle demande – AB AGENCY"
-    message["From"] = smtp_from
-    message["To"] = smtp_to
+    message["From"] = settings["from"]
+    message["To"] = settings["to"]
     message.set_content(
         "\n".join(
             [
@@ -586,21 +2156,477 @@ def _send_inquiry_email(payload: Dict[str, Any]) -> None:
             ]
         )
     )
+    return message
 
+
+def _write_durably(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with tmp.open("w", encoding="utf-8") as handle:
+        handle.write(json.dumps(data, ensure_ascii=False))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp, path)
+    dir_fd = os.open(path.parent, os.O_RDONLY)
     try:
-        with smtplib.SMTP(smtp_host, smtp_port, timeout=10) as server:
-            if smtp_use_tls:
-                server.starttls()
-            if smtp_user and smtp_pass:
-                server.login(smtp_user, smtp_pass)
-            server.send_message(message)
-    except Exception as exc:
-        print(f"Email send failed: {exc}")
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class MailQueue:
+    """Spool-directory outbox drained by one background thread per process.
+
+    Messages are fsynced into ``new/`` before the request returns. A sender
+    claims a file by renaming it into ``cur/`` (so gunicorn workers never
+    send the same message twice), keeps its SMTP session open between
+    messages, and reschedules failures with exponential backoff until
+    ``SMTP_MAX_ATTEMPTS``, after which the file is parked in ``failed/``.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.new_dir = directory / "new"
+        self.cur_dir = directory / "cur"
+        self.failed_dir = directory / "failed"
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0}
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._server: smtplib.SMTP | None = None
+        self._server_used = 0.0
+        self._recovered_at = 0.0
+
+    def enqueue(self, payload: Dict[str, Any]) -> Path:
+        for directory in (self.new_dir, self.cur_dir, self.failed_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        path = self.new_dir / f"{time.time_ns()}-{secrets.token_hex(4)}.json"
+        _write_durably(path, {"payload": payload, "attempts": 0, "next_attempt_at": 0})
+        self.stats["queued"] += 1
+        self.start()
+        self._wake.set()
+        return path
+
+    def start(self) -> None:
+        if self._thread is not None or not os.getenv("SMTP_HOST"):
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                delay = self._drain()
+            except Exception as exc:
+                print(f"Mail queue error: {exc}")
+                delay = MAIL_QUEUE_POLL
+            self._wake.wait(timeout=delay)
+            self._wake.clear()
+
+    def _recover(self) -> None:
+        # Files left in cur/ by a worker that died mid-send go back to new/.
+        # Runs on start and then once per MAIL_CLAIM_TIMEOUT, since the dead
+        # worker's replacement usually starts well within the timeout.
+        self._recovered_at = time.monotonic()
+        if not self.cur_dir.exists():
+            return
+        for path in self.cur_dir.glob("*.json"):
+            try:
+                if time.time() - path.stat().st_mtime > MAIL_CLAIM_TIMEOUT:
+                    os.rename(path, self.new_dir / path.name)
+            except FileNotFoundError:
+                continue
+
+    def _drain(self) -> float:
+        if time.monotonic() - self._recovered_at >= MAIL_CLAIM_TIMEOUT or not self._recovered_at:
+            self._recover()
+        next_due = MAIL_QUEUE_POLL
+        if not self.new_dir.exists():
+            return next_due
+        for path in sorted(self.new_dir.glob("*.json")):
+            try:
+                item = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            wait = item.get("next_attempt_at", 0) - time.time()
+            if wait > 0:
+                next_due = min(next_due, wait)
+                continue
+
+            claimed = self.cur_dir / path.name
+            try:
+                os.rename(path, claimed)
+                # The claim age, not the enqueue time, decides when another
+                # worker may take the message back.
+                os.utime(claimed)
+            except FileNotFoundError:
+                continue
+            try:
+                self._deliver(item["payload"])
+                self.stats["sent"] += 1
+            except Exception as exc:
+                self._close()
+                item["attempts"] = item.get("attempts", 0) + 1
+                item["last_error"] = str(exc)
+                if item["attempts"] >= SMTP_MAX_ATTEMPTS:
+                    print(f"Email send failed permanently: {exc}")
+                    _write_durably(self.failed_dir / path.name, item)
+                    self.stats["failed"] += 1
+                else:
+                    backoff = min(SMTP_RETRY_BASE * 2 ** (item["attempts"] - 1), SMTP_RETRY_MAX)
+                    item["next_attempt_at"] = time.time() + backoff
+                    _write_durably(path, item)
+                    self.stats["retried"] += 1
+                    next_due = min(next_due, backoff)
+            claimed.unlink(missing_ok=True)
+
+        if self._server is not None and time.monotonic() - self._server_used > SMTP_IDLE_TIMEOUT:
+            self._close()
+        return next_due
+
+    def _connection(self, settings: Dict[str, Any]) -> smtplib.SMTP:
+        if self._server is not None:
+            try:
+                # Servers drop idle sessions; probe before reusing an old one.
+                if time.monotonic() - self._server_used < 5 or self._server.noop()[0] == 250:
+                    return self._server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close()
+
+        server = smtplib.SMTP(settings["host"], settings["port"], timeout=10)
+        if settings["use_tls"]:
+            server.starttls()
+        if settings["user"] and settings["password"]:
+            server.login(settings["user"], settings["password"])
+        self._server = server
+        return server
+
+    def _deliver(self, payload: Dict[str, Any]) -> None:
+        settings = _smtp_settings()
+        if not settings:
+            raise RuntimeError("SMTP_HOST is not configured")
+        self._connection(settings).send_message(_inquiry_email(payload, settings))
+        self._server_used = time.monotonic()
+
+    def _close(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+
+
+mail_queue = MailQueue(OUTBOX_DIR)
+
+
+@app.before_request
+def _start_background_workers() -> None:
+    # Picks up mail and inquiries queued before a restart as soon as a worker
+    # serves its first request.
+    mail_queue.start()
+    inquiry_ingester.start()
+
+
+class _HashingUploadFile:
+    """Spool target for multipart file parts.
+
+    Werkzeug writes each parsed chunk straight into this file, so the upload
+    is hashed and size-checked while it streams to disk, and the temp file can
+    be renamed into place instead of copied.
+    """
+
+    def __init__(self, limit: int) -> None:
+        UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(
+            dir=UPLOAD_TMP_DIR, prefix="upload-", suffix=".part", delete=False
+        )
+        self.path = Path(self._file.name)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.limit = limit
+        self.claimed = False
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.limit:
+            # The parser drops this container when the error propagates, so
+            # nothing else would remove the partial file.
+            self.close()
+            raise RequestEntityTooLarge()
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._file, name)
+
+    def persist(self) -> Path:
+        self.claimed = True
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        return self.path
+
+    def close(self) -> None:
+        self._file.close()
+        if not self.claimed:
+            self.path.unlink(missing_ok=True)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(
+        self,
+        total_content_length: int | None,
+        content_type: str | None,
+        filename: str | None = None,
+        content_length: int | None = None,
+    ):
+        return _HashingUploadFile(MAX_UPLOAD_BYTES)
+
+
+app.request_class = UploadRequest
+app.jinja_env.globals["media_variants"] = _media_variants
+
+
+def _store_upload(temp_path: Path, digest: str, filename: str, user_id: int) -> Tuple[str, bool]:
+    # Content-addressed: identical bytes are stored once whoever uploads them,
+    # and the hash in the name lets /uploads serve them as immutable.
+    blob_dir = UPLOAD_BLOB_DIR / digest[:2]
+    blob_dir.mkdir(parents=True, exist_ok=True)
+    blob_path = blob_dir / f"sha256-{digest}{Path(filename).suffix.lower()}"
+    if blob_path.exists():
+        temp_path.unlink(missing_ok=True)
+    else:
+        os.replace(temp_path, blob_path)
+
+    _schedule_derivatives(blob_path, _derivative_key(blob_path, blob_path.stat()))
+
+    url = f"/uploads/blobs/{digest[:2]}/{blob_path.name}"
+    with engine.begin() as conn:
+        existing = conn.execute(
+            select(media_assets.c.id).where(
+                (media_assets.c.user_id == user_id) & (media_assets.c.url == url)
+            )
+        ).first()
+        if not existing:
+            conn.execute(
+                media_assets.insert().values(
+                    user_id=user_id,
+                    media_type=_media_type_for(filename),
+                    url=url,
+                )
+            )
+            bump_workspace(conn, user_id, "media")
+    return url, existing is not None
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sweep_stale_uploads() -> int:
+    """Delete temp files untouched for ``UPLOAD_SESSION_TTL`` seconds.
+
+    Covers abandoned resumable sessions (``<id>.part`` and ``<id>.json``) and
+    spool files left by interrupted multipart uploads. A live session's
+    ``.part`` is rewritten by every chunk, so only idle ones expire.
+    """
+    cutoff = time.time() - UPLOAD_SESSION_TTL
+    removed = 0
+    try:
+        entries = list(os.scandir(UPLOAD_TMP_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+@app.cli.command("sweep-uploads")
+def sweep_uploads_command() -> None:
+    """Delete abandoned upload sessions and spool files."""
+    print(f"Removed {sweep_stale_uploads()} stale upload files.")
+
+
+def _resumable_upload(upload_id: str, user_id: int) -> Tuple[Path, Dict[str, Any]] | None:
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+        return None
+    meta_path = UPLOAD_TMP_DIR / f"{upload_id}.json"
+    part_path = UPLOAD_TMP_DIR / f"{upload_id}.part"
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        idle = time.time() - part_path.stat().st_mtime
+    except (OSError, ValueError):
+        return None
+    if meta.get("user_id") != user_id:
+        return None
+    if idle > UPLOAD_SESSION_TTL:
+        # Expired: the sweep may not have run yet, so clear it here.
+        part_path.unlink(missing_ok=True)
+        meta_path.unlink(missing_ok=True)
+        return None
+    return part_path, meta
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(exc):
+    return (
+        jsonify({"status": "error", "message": "Fichier trop volumineux", "max_bytes": MAX_UPLOAD_BYTES}),
+        413,
+    )
+
+
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR")
+PAGE_CACHE_SIZE = 16
+PAGE_ENCODING_SUFFIXES = {"identity": "", "gzip": ".gz", "br": ".br"}
+ETAG_SUFFIXES = {"gzip": "gz", "br": "br"}
+
+
+class PageCache:
+    """Rendered anonymous pages, precompressed, per process and optionally on disk.
+
+    Entries are keyed by page name plus a key that changes whenever the
+    rendered output could: the template file, the static build and the asset
+    catalog. With ``PAGE_CACHE_DIR`` set, the first worker to render a
+    version writes it there and the other workers load it instead of
+    rendering it again.
+    """
+
+    def __init__(self, directory: str | None, size: int) -> None:
+        self.directory = Path(directory) if directory else None
+        self.size = size
+        self.entries: "OrderedDict[Tuple[str, str], PrecompressedBody]" = OrderedDict()
+        self.stats = {"hits": 0, "disk_hits": 0, "renders": 0, "bypassed": 0}
+        self.lock = threading.Lock()
+
+    def _paths(self, name: str, key: str) -> Dict[str, Path]:
+        assert self.directory is not None
+        return {
+            encoding: self.directory / f"{name}-{key}.html{suffix}"
+            for encoding, suffix in PAGE_ENCODING_SUFFIXES.items()
+        }
+
+    def _load(self, name: str, key: str, last_modified: datetime) -> PrecompressedBody | None:
+        contents: Dict[str, bytes] = {}
+        for encoding, path in self._paths(name, key).items():
+            try:
+                contents[encoding] = path.read_bytes()
+            except FileNotFoundError:
+                continue
+        if "identity" not in contents:
+            return None
+        # Same ETags as PrecompressedBody, so every worker sends the same
+        # validator for the same bytes.
+        digest = hashlib.sha256(contents["identity"]).hexdigest()[:32]
+        variants = {
+            encoding: (data, digest if encoding == "identity" else f"{digest}-{ETAG_SUFFIXES[encoding]}")
+            for encoding, data in contents.items()
+        }
+        return PrecompressedBody.from_variants(variants, "text/html", last_modified)
+
+    def _store(self, name: str, key: str, body: PrecompressedBody) -> None:
+        assert self.directory is not None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            paths = self._paths(name, key)
+            # identity last: its presence is what marks the entry complete.
+            for encoding in sorted(body.variants, key=lambda item: item == "identity"):
+                tmp = paths[encoding].with_name(f".{paths[encoding].name}.{os.getpid()}.tmp")
+                tmp.write_bytes(body.variants[encoding][0])
+                os.replace(tmp, paths[encoding])
+            current = {path.name for path in paths.values()}
+            for path in self.directory.glob(f"{name}-*.html*"):
+                if path.name not in current:
+                    path.unlink(missing_ok=True)
+        except OSError as exc:
+            print(f"Page cache write failed for {name}: {exc}")
+
+    def get(
+        self, name: str, key: str, last_modified: datetime, render: Callable[[], str]
+    ) -> PrecompressedBody:
+        with self.lock:
+            body = self.entries.get((name, key))
+            if body is not None:
+                self.entries.move_to_end((name, key))
+                self.stats["hits"] += 1
+                return body
+
+        body = self._load(name, key, last_modified) if self.directory else None
+        if body is not None:
+            self.stats["disk_hits"] += 1
+        else:
+            body = PrecompressedBody(render(), last_modified=last_modified, mimetype="text/html")
+            self.stats["renders"] += 1
+            if self.directory:
+                self._store(name, key, body)
+
+        with self.lock:
+            for cached_name, cached_key in list(self.entries):
+                if cached_name == name and cached_key != key:
+                    del self.entries[(cached_name, cached_key)]
+            self.entries[(name, key)] = body
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return body
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"entries": len(self.entries), "directory": str(self.directory or ""), **self.stats}
+
+
+page_cache = PageCache(PAGE_CACHE_DIR, PAGE_CACHE_SIZE)
+
+
+def _anonymous_page(template: str):
+    """Serve ``template`` rendered for a logged-out visitor from the page cache."""
+    template_stat = _media_stat(str(BASE_DIR / "templates" / template))
+    asset_catalog.get()
+    catalog_modified = asset_catalog.last_modified
+    key = hashlib.sha256(
+        json.dumps(
+            [
+                template_stat.st_mtime_ns if template_stat else 0,
+                static_manifest()["version"],
+                catalog_modified.isoformat() if catalog_modified else None,
+            ]
+        ).encode()
+    ).hexdigest()[:16]
+    last_modified = max(
+        filter(None, [
+            datetime.fromtimestamp(template_stat.st_mtime, tz=timezone.utc) if template_stat else None,
+            catalog_modified,
+        ]),
+        default=datetime.now(timezone.utc),
+    )
+    body = page_cache.get(
+        Path(template).stem, key, last_modified, lambda: render_template(template, current_user=None)
+    )
+    response = _precompressed_response(body)
+    response.vary.add("Cookie")
+    return response
 
 
 @app.route("/")
 def index():
-    return render_template("index.html", current_user=get_current_user())
+    # Anyone with a session cookie may be logged in and get a personalised
+    # page; everyone else shares one cached render.
+    if request.cookies.get(app.config["SESSION_COOKIE_NAME"]):
+        page_cache.stats["bypassed"] += 1
+        response = app.make_response(render_template("index.html", current_user=get_current_user()))
+        response.vary.add("Cookie")
+        return response
+    return _anonymous_page("index.html")
 
 
 @app.route("/test")
@@ -608,6 +2634,142 @@ def test():
     return send_from_directory(BASE_DIR, "test_media.html")
 
 
+# Any Werkzeug method string: "scrypt:<n>:<r>:<p>" or "pbkdf2:<hash>:<iterations>".
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+PASSWORD_QUEUE_MAX = int(os.getenv("PASSWORD_QUEUE_MAX", "16"))
+PASSWORD_RETRY_AFTER = 2
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+def _canonical_hash_method(method: str) -> str:
+    # Werkzeug fills in default parameters when it hashes ("scrypt" ->
+    # "scrypt:32768:8:1"); stored hashes carry the expanded form.
+    name, *args = method.split(":")
+    if name == "scrypt":
+        n, r, p = (int(arg) for arg in args) if args else (2**15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    if name == "pbkdf2":
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    return method
+
+
+class PasswordHasher:
+    """Runs password hashing on a few dedicated threads.
+
+    hashlib's scrypt and pbkdf2_hmac release the GIL, so the threads use real
+    cores while the request threads keep serving other pages. At most
+    ``workers`` hashes run at once per process; past ``queue_max`` waiting
+    logins, new ones are refused instead of queueing behind the burst.
+    """
+
+    def __init__(self, method: str, workers: int, queue_max: int) -> None:
+        self.method = method
+        self.workers = max(workers, 1)
+        self.queue_max = queue_max
+        self.executor: concurrent.futures.ThreadPoolExecutor | None = None
+        self.prefix = _canonical_hash_method(method)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.stats: Dict[str, Any] = {
+            "hashes": 0,
+            "verified": 0,
+            "failed": 0,
+            "rehashed": 0,
+            "rejected": 0,
+            "queue_max_seen": 0,
+            "hash_total_ms": 0.0,
+            "hash_max_ms": 0.0,
+            "wait_total_ms": 0.0,
+            "wait_max_ms": 0.0,
+        }
+        self.latencies: "deque[float]" = deque(maxlen=512)
+
+    def _submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        with self.lock:
+            if self.pending >= self.workers + self.queue_max:
+                self.stats["rejected"] += 1
+                raise PasswordPoolBusy()
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password"
+                )
+            self.pending += 1
+            self.stats["queue_max_seen"] = max(self.stats["queue_max_seen"], self.pending)
+            executor = self.executor
+
+        queued = time.perf_counter()
+
+        def run() -> Tuple[float, float, Any]:
+            started = time.perf_counter()
+            result = func(*args)
+            return started - queued, time.perf_counter() - started, result
+
+        try:
+            waited, elapsed, result = executor.submit(run).result()
+        finally:
+            with self.lock:
+                self.pending -= 1
+        with self.lock:
+            self.stats["hashes"] += 1
+            self.stats["wait_total_ms"] += waited * 1000
+            self.stats["wait_max_ms"] = max(self.stats["wait_max_ms"], waited * 1000)
+            self.stats["hash_total_ms"] += elapsed * 1000
+            self.stats["hash_max_ms"] = max(self.stats["hash_max_ms"], elapsed * 1000)
+            self.latencies.append(elapsed * 1000)
+        return result
+
+    def hash(self, password: str) -> str:
+        return self._submit(generate_password_hash, password, self.method)
+
+    def verify(self, stored: str, password: str) -> bool:
+        ok = self._submit(check_password_hash, stored, password)
+        with self.lock:
+            self.stats["verified" if ok else "failed"] += 1
+        return ok
+
+    def needs_rehash(self, stored: str) -> bool:
+        return stored.split("$", 1)[0] != self.prefix
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            data = dict(self.stats, queue_depth=self.pending)
+            latencies = sorted(self.latencies)
+        hashes = data["hashes"]
+        data.update(
+            method=self.method,
+            workers=self.workers,
+            queue_limit=self.queue_max,
+            hash_avg_ms=round(data["hash_total_ms"] / hashes, 3) if hashes else 0.0,
+            hash_p95_ms=round(latencies[int(len(latencies) * 0.95)], 3) if latencies else 0.0,
+            wait_avg_ms=round(data["wait_total_ms"] / hashes, 3) if hashes else 0.0,
+        )
+        for key in ("hash_total_ms", "hash_max_ms", "wait_total_ms", "wait_max_ms"):
+            data[key] = round(data[key], 3)
+        return data
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_METHOD, PASSWORD_WORKERS, PASSWORD_QUEUE_MAX)
+
+
+def _upgrade_password_hash(user_id: int, stored: str, password: str) -> None:
+    # Compare-and-set on the old hash, so a password changed meanwhile wins.
+    new_hash = password_hasher.hash(password)
+    with engine.begin() as conn:
+        conn.execute(
+            users.update()
+            .where((users.c.id == user_id) & (users.c.password_hash == stored))
+            .values(password_hash=new_hash)
+        )
+    with password_hasher.lock:
+        password_hasher.stats["rehashed"] += 1
+
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
@@ -619,10 +2781,23 @@ def login():
 
         with engine.begin() as conn:
             row = conn.execute(select(users).where(users.c.email == email)).mappings().first()
-        if not row or not check_password_hash(row["password_hash"], password):
-            return render_template("login.html", error="Identifiants invalides")
+        try:
+            if not row or not password_hasher.verify(row["password_hash"], password):
+                return render_template("login.html", error="Identifiants invalides")
+        except PasswordPoolBusy:
+            response = app.make_response(
+                (render_template("login.html", error="Trop de connexions en cours, réessayez dans un instant"), 503)
+            )
+            response.headers["Retry-After"] = str(PASSWORD_RETRY_AFTER)
+            return response
+        try:
+            if password_hasher.needs_rehash(row["password_hash"]):
+                _upgrade_password_hash(row["id"], row["password_hash"], password)
+        except PasswordPoolBusy:
+            pass  # Upgraded on a later, quieter login.
 
         session["user_id"] = row["id"]
+        invalidate_user(row["id"])
         return redirect(url_for("workspace"))
 
     return render_template("login.html", error=None)
@@ -640,61 +2815,142 @@ def workspace():
     if not current_user:
         return redirect(url_for("login"))
 
-    with engine.begin() as conn:
-        profile = conn.execute(
-            select(profiles).where(profiles.c.user_id == current_user["id"])
-        ).mappings().first()
-        subscription = conn.execute(
-            select(subscriptions).where(subscriptions.c.user_id == current_user["id"])
-        ).mappings().first()
-        user_events = conn.execute(
-            select(events).where(events.c.user_id == current_user["id"]).order_by(events.c.event_date)
-        ).mappings().all()
-        user_performances = conn.execute(
-            select(performances)
-            .where(performances.c.user_id == current_user["id"])
-            .order_by(performances.c.performance_date.desc())
-        ).mappings().all()
-        user_media = conn.execute(
-            select(media_assets)
-            .where(media_assets.c.user_id == current_user["id"])
-            .order_by(media_assets.c.uploaded_at.desc())
-        ).mappings().all()
-        chat_messages = conn.execute(
-            select(messages)
-            .where(
-                (messages.c.sender_id == current_user["id"]) |
-                (messages.c.recipient_id == current_user["id"])
-            )
-            .order_by(messages.c.created_at.desc())
-            .limit(50)
-        ).mappings().all()
-
     return render_template(
         "workspace.html",
         current_user=current_user,
-        profile=profile,
-        subscription=subscription,
-        user_events=user_events,
-        user_performances=user_performances,
-        user_media=user_media,
-        chat_messages=chat_messages,
+        fragments=workspace_fragments(current_user["id"]),
     )
 
 
-@app.route("/assets")
-def assets():
-    return jsonify({"assets": scan_assets()})
+@app.route("/workspace/fragments/<section>")
+def workspace_fragment(section: str):
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    if section not in WORKSPACE_FRAGMENTS:
+        return jsonify({"status": "error", "message": "Unknown section"}), 404
 
+    response = Response(workspace_fragments(current_user["id"], (section,))[section], mimetype="text/html")
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
-@app.route("/assets/<path:filename>")
-def asset_file(filename: str):
-    return send_from_directory(ASSET_DIR, filename)
 
+@app.route("/api/workspace")
+@app.route("/api/workspace/<section>")
+def workspace_data(section: str | None = None):
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
 
-@app.route("/milestones")
-def milestones():
-    assets = scan_assets()
+    known = list(_workspace_sections(current_user["id"]))
+    names = [section] if section else [
+        name for name in request.args.get("sections", "").split(",") if name
+    ] or known
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        return jsonify({"status": "error", "message": "Unknown section", "sections": unknown}), 404
+    try:
+        limit = int(request.args.get("limit", WORKSPACE_PAGE_SIZE))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid limit or offset"}), 400
+    limit = max(1, min(limit, WORKSPACE_MAX_PAGE_SIZE))
+
+    data = load_workspace(current_user["id"], names, limit=limit, offset=max(offset, 0))
+    return jsonify({"status": "ok", **data})
+
+
+ASSET_FIELDS = ("id", "filename", "filepath", "asset_type", "category", "title", "metadata")
+ASSETS_PAGE_SIZE = int(os.getenv("ASSETS_PAGE_SIZE", "50"))
+ASSETS_MAX_PAGE_SIZE = int(os.getenv("ASSETS_MAX_PAGE_SIZE", "500"))
+ASSET_QUERY_ARGS = {"asset_type", "category", "limit", "cursor", "fields"}
+
+
+def _build_asset_index(
+    catalog: List[Dict[str, Any]],
+) -> Dict[Tuple[str | None, str | None], Tuple[List[int], List[Dict[str, Any]]]]:
+    buckets: Dict[Tuple[str | None, str | None], List[Dict[str, Any]]] = {}
+    for asset in sorted(catalog, key=lambda item: item["id"]):
+        asset_type, category = asset["asset_type"], asset["category"]
+        for key in ((None, None), (asset_type, None), (None, category), (asset_type, category)):
+            buckets.setdefault(key, []).append(asset)
+    return {key: ([asset["id"] for asset in items], items) for key, items in buckets.items()}
+
+
+def _asset_page():
+    args = request.args
+    try:
+        limit = int(args.get("limit", ASSETS_PAGE_SIZE))
+        after = int(args.get("cursor", 0) or 0)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid limit or cursor"}), 400
+    limit = max(1, min(limit, ASSETS_MAX_PAGE_SIZE))
+
+    fields = [field for field in args.get("fields", "").split(",") if field]
+    unknown = [field for field in fields if field not in ASSET_FIELDS]
+    if unknown:
+        return jsonify({"status": "error", "message": "Unknown fields", "fields": unknown}), 400
+
+    index = asset_catalog.derived("index", _build_asset_index)
+    ids, items = index.get((args.get("asset_type") or None, args.get("category") or None), ([], []))
+    start = bisect.bisect_right(ids, after)
+    page = items[start:start + limit]
+    if fields:
+        page = [{field: asset[field] for field in fields} for asset in page]
+
+    has_more = start + limit < len(items)
+    response = jsonify(
+        {
+            "assets": page,
+            "total": len(items),
+            "next_cursor": str(ids[start + limit - 1]) if has_more else None,
+        }
+    )
+    # The ETag hashes the body, so it must not include the catalog version:
+    # that counter is per process and would differ between workers.
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@app.route("/assets")
+def assets():
+    if ASSET_QUERY_ARGS.intersection(request.args):
+        return _asset_page()
+
+    body = asset_catalog.derived(
+        "assets_body",
+        lambda catalog: PrecompressedBody(
+            {"assets": catalog, "version": asset_catalog.version},
+            last_modified=asset_catalog.last_modified,
+            etag_basis=catalog,
+        ),
+    )
+    return _precompressed_response(body)
+
+
+@app.route("/assets/catalog")
+def asset_catalog_stats():
+    asset_catalog.get()
+    return jsonify(asset_catalog.snapshot())
+
+
+@app.route("/assets/refresh", methods=["POST"])
+def refresh_assets():
+    current_user = get_current_user()
+    if not current_user or current_user.get("role") not in {"admin", "moderator"}:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+
+    version = asset_catalog.refresh()
+    return jsonify({"status": "ok", "version": version, "catalog": asset_catalog.snapshot()})
+
+
+@app.route("/assets/<path:filename>")
+def asset_file(filename: str):
+    return _serve_media(ASSET_DIR, filename)
+
+
+def _build_milestones(assets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     asset_ids = [asset["id"] for asset in assets]
     milestones_data = [
         {
@@ -738,7 +2994,237 @@ def milestones():
             "media_assets": asset_ids[8:10],
         },
     ]
-    return jsonify({"milestones": milestones_data})
+    return milestones_data
+
+
+def _milestones_body(catalog: List[Dict[str, Any]]) -> PrecompressedBody:
+    milestones_data = _build_milestones(catalog)
+    return PrecompressedBody(
+        {"milestones": milestones_data, "version": asset_catalog.version},
+        last_modified=asset_catalog.last_modified,
+        etag_basis=milestones_data,
+    )
+
+
+@app.route("/milestones")
+def milestones():
+    body = asset_catalog.derived(
+        "milestones_body",
+        _milestones_body,
+    )
+    return _precompressed_response(body)
+
+
+INQUIRY_LOG = Path(os.getenv("INQUIRY_LOG", BASE_DIR / "inquiries.jsonl"))
+INQUIRY_BATCH_SIZE = int(os.getenv("INQUIRY_BATCH_SIZE", "500"))
+INQUIRY_BATCH_WINDOW = float(os.getenv("INQUIRY_BATCH_WINDOW", "0.2"))
+INQUIRY_REPLAY_INTERVAL = float(os.getenv("INQUIRY_REPLAY_INTERVAL", "5"))
+
+
+def _append_jsonl(path: Path, records: List[Dict[str, Any]]) -> None:
+    data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        # One locked write per call keeps lines from concurrent workers whole.
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _inquiry_key(payload: Dict[str, Any]) -> str:
+    # Lines logged before keys existed get one derived from their content,
+    # so replaying them more than once is still idempotent.
+    if payload.get("inquiry_key"):
+        return str(payload["inquiry_key"])
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def _inquiry_row(payload: Dict[str, Any]) -> Dict[str, Any]:
+    received_at = payload.get("received_at")
+    return {
+        "inquiry_key": _inquiry_key(payload),
+        "client_name": payload["client_name"],
+        "email": payload["email"],
+        "event_type": payload["event_type"],
+        "event_date": date.fromisoformat(str(payload["event_date"])[:10]),
+        "message": payload["message"],
+        "created_at": datetime.fromisoformat(received_at) if received_at else datetime.utcnow(),
+    }
+
+
+class InquiryIngester:
+    """Write-ahead log for inquiries, replayed into the database in batches.
+
+    ``/inquiry`` only appends to ``inquiries.jsonl`` (locked and fsynced), so
+    a burst costs one file append per request rather than one transaction.
+    The replay reads from the last checkpoint, drops keys already in the
+    table and inserts the rest with a single ``executemany`` per batch before
+    advancing the checkpoint. A crash between commit and checkpoint just
+    replays rows the dedup step skips. Once everything is ingested the log
+    is truncated.
+    """
+
+    def __init__(self, log_path: Path) -> None:
+        self.log_path = log_path
+        self.checkpoint_path = log_path.with_name(log_path.name + ".offset")
+        self.lock_path = log_path.with_name(log_path.name + ".lock")
+        self.rejects_path = log_path.with_name(log_path.stem + ".rejected.jsonl")
+        self.stats = {"appended": 0, "ingested": 0, "duplicates": 0, "rejected": 0, "batches": 0}
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def append(self, payload: Dict[str, Any]) -> None:
+        _append_jsonl(self.log_path, [payload])
+        self.stats["appended"] += 1
+        self.start()
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="inquiry-ingest", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.replay()
+            except Exception as exc:
+                print(f"Inquiry replay failed: {exc}")
+            self._wake.wait(timeout=INQUIRY_REPLAY_INTERVAL)
+            self._wake.clear()
+            # Let a burst accumulate so it lands in one batch.
+            time.sleep(INQUIRY_BATCH_WINDOW)
+
+    def _read_checkpoint(self) -> int:
+        try:
+            return int(self.checkpoint_path.read_text().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_checkpoint(self, offset: int) -> None:
+        tmp = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        tmp.write_text(str(offset))
+        os.replace(tmp, self.checkpoint_path)
+
+    def pending_bytes(self) -> int:
+        try:
+            return max(self.log_path.stat().st_size - self._read_checkpoint(), 0)
+        except FileNotFoundError:
+            return 0
+
+    def replay(self, blocking: bool = False) -> Dict[str, Any]:
+        result = {"ingested": 0, "duplicates": 0, "rejected": 0, "skipped": False}
+        if not self.log_path.exists():
+            return result
+
+        lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker is already replaying.
+                result["skipped"] = True
+                return result
+
+            offset = self._read_checkpoint()
+            with self.log_path.open("rb") as handle:
+                if offset > os.fstat(handle.fileno()).st_size:
+                    offset = 0
+                handle.seek(offset)
+                while True:
+                    lines: List[bytes] = []
+                    end = offset
+                    while len(lines) < INQUIRY_BATCH_SIZE:
+                        line = handle.readline()
+                        if not line.endswith(b"\n"):
+                            break  # EOF, or a line still being written
+                        end += len(line)
+                        lines.append(line)
+                    if not lines:
+                        break
+                    for key, count in self._ingest(lines).items():
+                        result[key] += count
+                    offset = end
+                    self._write_checkpoint(offset)
+            self._compact(offset)
+        finally:
+            os.close(lock_fd)
+
+        for key in ("ingested", "duplicates", "rejected"):
+            self.stats[key] += result[key]
+        return result
+
+    def _ingest(self, lines: List[bytes]) -> Dict[str, int]:
+        rows: Dict[str, Dict[str, Any]] = {}
+        rejected: List[Dict[str, Any]] = []
+        for line in lines:
+            try:
+                row = _inquiry_row(json.loads(line))
+            except (ValueError, KeyError, TypeError) as exc:
+                rejected.append({"line": line.decode("utf-8", "replace").rstrip("\n"), "error": str(exc)})
+                continue
+            rows.setdefault(row["inquiry_key"], row)
+
+        fresh: List[Dict[str, Any]] = []
+        if rows:
+            with engine.begin() as conn:
+                existing = set(
+                    conn.execute(
+                        select(inquiries.c.inquiry_key).where(inquiries.c.inquiry_key.in_(list(rows)))
+                    ).scalars()
+                )
+                fresh = [row for key, row in rows.items() if key not in existing]
+                if fresh:
+                    conn.execute(inquiries.insert(), fresh)
+        if rejected:
+            _append_jsonl(self.rejects_path, rejected)
+
+        self.stats["batches"] += 1
+        return {
+            "ingested": len(fresh),
+            "duplicates": len(lines) - len(rejected) - len(fresh),
+            "rejected": len(rejected),
+        }
+
+    def _compact(self, offset: int) -> None:
+        with self.log_path.open("r+b") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            if os.fstat(handle.fileno()).st_size == offset and offset:
+                handle.truncate(0)
+                os.fsync(handle.fileno())
+                self._write_checkpoint(0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "pending_bytes": self.pending_bytes()}
+
+
+inquiry_ingester = InquiryIngester(INQUIRY_LOG)
+
+
+@app.cli.command("replay-inquiries")
+def replay_inquiries_command() -> None:
+    """Load any inquiries still in the write-ahead log into the database."""
+    result = inquiry_ingester.replay(blocking=True)
+    print(json.dumps(result))
+
+
+@app.route("/api/inquiries/replay", methods=["POST"])
+def replay_inquiries():
+    current_user = get_current_user()
+    if not current_user or current_user.get("role") not in {"admin", "moderator"}:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+
+    result = inquiry_ingester.replay(blocking=True)
+    return jsonify({"status": "ok", **result, "ingester": inquiry_ingester.snapshot()})
 
 
 @app.route("/inquiry", methods=["POST"])
@@ -750,22 +3236,25 @@ def inquiry():
         return jsonify({"status": "error", "missing": missing}), 400
 
     try:
+        date.fromisoformat(str(payload["event_date"])[:10])
+    except ValueError:
+        return jsonify({"status": "error", "invalid": ["event_date"]}), 400
+
+    payload = {field: payload[field] for field in required_fields}
+    payload["inquiry_key"] = secrets.token_hex(16)
+    payload["received_at"] = datetime.utcnow().isoformat()
+    try:
+        inquiry_ingester.append(payload)
+    except OSError:
         with engine.begin() as conn:
-            conn.execute(
-                inquiries.insert().values(
-                    client_name=payload["client_name"],
-                    email=payload["email"],
-                    event_type=payload["event_type"],
-                    event_date=payload["event_date"],
-                    message=payload["message"],
-                )
-            )
-    except Exception:
-        log_path = BASE_DIR / "inquiries.jsonl"
-        with log_path.open("a", encoding="utf-8") as handle:
-            handle.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            conn.execute(inquiries.insert().values(**_inquiry_row(payload)))
 
-    _send_inquiry_email(payload)
+    if os.getenv("SMTP_HOST"):
+        try:
+            mail_queue.enqueue(payload)
+        except OSError as exc:
+            # The inquiry itself is already logged; only the notification is lost.
+            print(f"Could not queue inquiry email: {exc}")
 
     return jsonify({"status": "ok"})
 
@@ -802,10 +3291,60 @@ def update_profile():
                     website=payload.get("website"),
                 )
             )
+        bump_workspace(conn, current_user["id"], "profile")
 
+    invalidate_user(current_user["id"])
     return jsonify({"status": "ok"})
 
 
+def _iso_date(value: Any) -> date:
+    try:
+        return date.fromisoformat(str(value or "").strip())
+    except ValueError:
+        raise ValueError("Date invalide") from None
+
+
+def _title(payload: Dict[str, Any]) -> str:
+    title = str(payload.get("title") or "").strip()
+    if not title:
+        raise ValueError("Titre manquant")
+    return title[:255]
+
+
+def _event_row(payload: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "title": _title(payload),
+        "event_date": _iso_date(payload.get("event_date")),
+        "location": str(payload.get("location") or "")[:255],
+    }
+
+
+def _performance_row(payload: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+    try:
+        fee = float(payload.get("fee", 0) or 0)
+    except (TypeError, ValueError):
+        raise ValueError("Honoraires invalides") from None
+    return {
+        "user_id": user_id,
+        "title": _title(payload),
+        "performance_date": _iso_date(payload.get("performance_date")),
+        "fee": fee,
+    }
+
+
+def _media_row(payload: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+    url = str(payload.get("url") or "").strip()
+    if not url:
+        raise ValueError("Missing URL")
+    media_type = payload.get("media_type") or _media_type_for(url)
+    if media_type not in {"image", "video"}:
+        raise ValueError("Type de média invalide")
+    # uploaded_at is set here rather than left to the column default: the
+    # Postgres COPY import path bypasses SQLAlchemy's Python-side defaults.
+    return {"user_id": user_id, "media_type": media_type, "url": url[:500], "uploaded_at": datetime.utcnow()}
+
+
 @app.route("/api/events", methods=["POST"])
 def add_event():
     current_user = get_current_user()
@@ -813,15 +3352,14 @@ def add_event():
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
 
     payload = request.get_json(silent=True) or request.form.to_dict()
+    try:
+        row = _event_row(payload, current_user["id"])
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
     with engine.begin() as conn:
-        conn.execute(
-            events.insert().values(
-                user_id=current_user["id"],
-                title=payload.get("title", "")[:255],
-                event_date=payload.get("event_date"),
-                location=payload.get("location", "")[:255],
-            )
-        )
+        conn.execute(events.insert().values(**row))
+        bump_workspace(conn, current_user["id"], "events")
+        invalidate_availability(conn)
     return jsonify({"status": "ok"})
 
 
@@ -832,17 +3370,93 @@ def add_performance():
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
 
     payload = request.get_json(silent=True) or request.form.to_dict()
-    fee_value = float(payload.get("fee", 0) or 0)
+    try:
+        row = _performance_row(payload, current_user["id"])
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
     with engine.begin() as conn:
+        conn.execute(performances.insert().values(**row))
+        _record_earnings(conn, current_user["id"], row["performance_date"], row["fee"])
+        bump_workspace(conn, current_user["id"], "performances")
+        invalidate_availability(conn)
+    return jsonify({"status": "ok"})
+
+
+EARNINGS_MAX_MONTHS = 240
+
+
+def _record_earnings(conn, user_id: int, performance_date: date, fee: float, count: int = 1) -> None:
+    month = performance_date.replace(day=1)
+    for rollup_id in (user_id, AGENCY_ROLLUP_ID):
+        stmt = _upsert_insert(earnings_monthly).values(
+            user_id=rollup_id, month=month, total=fee, performance_count=count
+        )
         conn.execute(
-            performances.insert().values(
-                user_id=current_user["id"],
-                title=payload.get("title", "")[:255],
-                performance_date=payload.get("performance_date"),
-                fee=fee_value,
+            stmt.on_conflict_do_update(
+                index_elements=[earnings_monthly.c.user_id, earnings_monthly.c.month],
+                set_={
+                    "total": earnings_monthly.c.total + stmt.excluded.total,
+                    "performance_count": earnings_monthly.c.performance_count + stmt.excluded.performance_count,
+                },
             )
         )
-    return jsonify({"status": "ok"})
+
+
+def _earnings_summary(rollup_id: int, months: int) -> Dict[str, Any]:
+    # One rollup row per month, so years of history stay a few hundred rows.
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(earnings_monthly.c.month, earnings_monthly.c.total, earnings_monthly.c.performance_count)
+            .where(earnings_monthly.c.user_id == rollup_id)
+            .order_by(earnings_monthly.c.month)
+        ).all()
+
+    yearly: Dict[int, Dict[str, Any]] = {}
+    for month, total, count in rows:
+        year = yearly.setdefault(month.year, {"year": month.year, "total": 0.0, "performance_count": 0})
+        year["total"] += total
+        year["performance_count"] += count
+
+    this_month = date.today().replace(day=1)
+    first = this_month.year * 12 + this_month.month - 12  # 11 months back, months counted from 0
+    window_start = date(first // 12, first % 12 + 1, 1)
+    rolling = [row for row in rows if window_start <= row[0] <= this_month]
+    return {
+        "monthly": [
+            {"month": month.strftime("%Y-%m"), "total": round(total, 2), "performance_count": count}
+            for month, total, count in rows[-months:]
+        ],
+        "yearly": [{**year, "total": round(year["total"], 2)} for year in yearly.values()],
+        "rolling_12_months": {
+            "from": window_start.strftime("%Y-%m"),
+            "to": this_month.strftime("%Y-%m"),
+            "total": round(sum(row[1] for row in rolling), 2),
+            "performance_count": sum(row[2] for row in rolling),
+        },
+    }
+
+
+@app.route("/api/analytics/earnings")
+def earnings_analytics():
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    scope = request.args.get("scope", "me")
+    if scope == "me":
+        rollup_id = current_user["id"]
+    elif current_user.get("role") not in {"admin", "moderator"}:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+    elif scope == "agency":
+        rollup_id = AGENCY_ROLLUP_ID
+    elif scope.isdigit():
+        rollup_id = int(scope)
+    else:
+        return jsonify({"status": "error", "message": "scope invalide"}), 400
+
+    months = max(1, min(request.args.get("months", 24, type=int) or 24, EARNINGS_MAX_MONTHS))
+    summary = _earnings_summary(rollup_id, months)
+    return jsonify({"scope": scope, "user_id": rollup_id or None, "currency": "EUR", **summary})
 
 
 @app.route("/api/media/upload", methods=["POST"])
@@ -859,22 +3473,108 @@ def upload_media():
         return jsonify({"status": "error", "message": "Invalid filename"}), 400
 
     filename = secure_filename(file.filename)
-    user_folder = UPLOAD_DIR / str(current_user["id"])
-    user_folder.mkdir(parents=True, exist_ok=True)
-    target_path = user_folder / filename
-    file.save(target_path)
+    stream = file.stream
+    if isinstance(stream, _HashingUploadFile):
+        digest = stream.sha256.hexdigest()
+        temp_path = stream.persist()
+    else:
+        UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+        temp_path = UPLOAD_TMP_DIR / f"upload-{secrets.token_hex(8)}.part"
+        file.save(temp_path)
+        digest = _file_sha256(temp_path)
 
-    media_type = "video" if filename.lower().endswith((".mp4", ".webm", ".mov")) else "image"
-    url = f"/uploads/{current_user['id']}/{filename}"
-    with engine.begin() as conn:
-        conn.execute(
-            media_assets.insert().values(
-                user_id=current_user["id"],
-                media_type=media_type,
-                url=url,
-            )
-        )
-    return jsonify({"status": "ok", "url": url})
+    url, duplicate = _store_upload(temp_path, digest, filename, current_user["id"])
+    return jsonify({"status": "ok", "url": url, "sha256": digest, "duplicate": duplicate})
+
+
+@app.route("/api/media/uploads", methods=["POST"])
+def start_resumable_upload():
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    payload = request.get_json(silent=True) or request.form.to_dict()
+    filename = secure_filename(payload.get("filename", ""))
+    try:
+        size = int(payload.get("size", 0))
+    except (TypeError, ValueError):
+        size = 0
+    if not filename or size <= 0:
+        return jsonify({"status": "error", "message": "Invalid filename or size"}), 400
+    if size > MAX_UPLOAD_BYTES:
+        raise RequestEntityTooLarge()
+
+    sweep_stale_uploads()
+    upload_id = secrets.token_hex(16)
+    UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    (UPLOAD_TMP_DIR / f"{upload_id}.part").touch()
+    (UPLOAD_TMP_DIR / f"{upload_id}.json").write_text(
+        json.dumps({"user_id": current_user["id"], "filename": filename, "size": size}),
+        encoding="utf-8",
+    )
+    return jsonify(
+        {"status": "ok", "upload_id": upload_id, "offset": 0, "chunk_size": UPLOAD_CHUNK_SIZE}
+    )
+
+
+@app.route("/api/media/uploads/<upload_id>", methods=["GET"])
+def resumable_upload_status(upload_id: str):
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    upload = _resumable_upload(upload_id, current_user["id"])
+    if not upload:
+        return jsonify({"status": "error", "message": "Unknown upload"}), 404
+    part_path, meta = upload
+    return jsonify({"status": "ok", "offset": part_path.stat().st_size, "size": meta["size"]})
+
+
+@app.route("/api/media/uploads/<upload_id>", methods=["PUT"])
+def append_resumable_upload(upload_id: str):
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    upload = _resumable_upload(upload_id, current_user["id"])
+    if not upload:
+        return jsonify({"status": "error", "message": "Unknown upload"}), 404
+    part_path, meta = upload
+
+    content_range = parse_content_range_header(request.headers.get("Content-Range"))
+    with part_path.open("ab") as handle:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return jsonify({"status": "error", "message": "Upload busy"}), 409
+        offset = handle.tell()
+        if (
+            content_range is None
+            or content_range.start != offset
+            or content_range.length != meta["size"]
+        ):
+            return jsonify({"status": "error", "message": "Unexpected range", "offset": offset}), 409
+
+        remaining = content_range.stop - content_range.start
+        while remaining > 0:
+            chunk = request.stream.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            handle.write(chunk)
+            remaining -= len(chunk)
+        handle.flush()
+        os.fsync(handle.fileno())
+        offset = handle.tell()
+
+    if offset < meta["size"]:
+        return jsonify({"status": "ok", "offset": offset})
+
+    digest = _file_sha256(part_path)
+    url, duplicate = _store_upload(part_path, digest, meta["filename"], current_user["id"])
+    (UPLOAD_TMP_DIR / f"{upload_id}.json").unlink(missing_ok=True)
+    return jsonify(
+        {"status": "ok", "offset": offset, "url": url, "sha256": digest, "duplicate": duplicate}
+    )
 
 
 @app.route("/api/media/url", methods=["POST"])
@@ -884,22 +3584,336 @@ def add_media_url():
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
 
     payload = request.get_json(silent=True) or request.form.to_dict()
-    url = payload.get("url", "").strip()
-    media_type = payload.get("media_type", "image")
-    if not url:
-        return jsonify({"status": "error", "message": "Missing URL"}), 400
+    try:
+        row = _media_row(payload, current_user["id"])
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
 
     with engine.begin() as conn:
-        conn.execute(
-            media_assets.insert().values(
-                user_id=current_user["id"],
-                media_type=media_type,
-                url=url,
-            )
-        )
+        conn.execute(media_assets.insert().values(**row))
+        bump_workspace(conn, current_user["id"], "media")
     return jsonify({"status": "ok"})
 
 
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = 100
+EXPORT_BATCH_SIZE = 500
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+
+# kind -> (table, row builder, export order matching the workspace indexes)
+BULK_KINDS: Dict[str, Tuple[Table, Callable[[Dict[str, Any], int], Dict[str, Any]], List[Any]]] = {
+    "events": (events, _event_row, [events.c.event_date, events.c.id]),
+    "performances": (performances, _performance_row, [performances.c.performance_date, performances.c.id]),
+    "media": (media_assets, _media_row, [media_assets.c.uploaded_at, media_assets.c.id]),
+}
+
+
+def _iter_json_array(stream: io.TextIOBase, chunk_size: int = 65536) -> Iterator[Any]:
+    # Decodes one element at a time so a large array is never held whole.
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Un tableau JSON est attendu")
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(","):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                raise ValueError("JSON invalide") from None
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def _iter_import_records(stream, import_format: str) -> Iterator[Any]:
+    """Yield one record per input row; undecodable NDJSON lines yield the error."""
+    text_stream = io.TextIOWrapper(io.BufferedReader(stream), encoding="utf-8-sig", newline="")
+    if import_format == "csv":
+        try:
+            yield from csv.DictReader(text_stream)
+        except csv.Error as exc:
+            # A broken quote or oversized field; reported like a malformed JSON array.
+            raise ValueError(f"CSV invalide ({exc})") from None
+    elif import_format == "ndjson":
+        for line in text_stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield ValueError("JSON invalide")
+    else:
+        yield from _iter_json_array(text_stream)
+
+
+def _import_format() -> str | None:
+    requested = request.args.get("format")
+    if requested in {"csv", "json", "ndjson"}:
+        return requested
+    if request.mimetype == "text/csv":
+        return "csv"
+    if request.mimetype in NDJSON_TYPES:
+        return "ndjson"
+    if request.mimetype == "application/json":
+        return "json"
+    return None
+
+
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _bulk_insert(conn, table: Table, rows: List[Dict[str, Any]]) -> None:
+    if engine.dialect.name != "postgresql":
+        conn.execute(table.insert(), rows)
+        return
+    # COPY streams the whole batch in one round trip (text format: tab
+    # separated, backslash escapes, \N for NULL). It skips SQLAlchemy's
+    # Python-side column defaults, so the row builders fill every column.
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row.values()) + "\n")
+    buffer.seek(0)
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, date):
+        value = value.isoformat()
+    return str(value).translate(COPY_ESCAPES)
+
+
+@app.route("/api/import/<kind>", methods=["POST"])
+def bulk_import(kind: str):
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    if kind not in BULK_KINDS:
+        return jsonify({"status": "error", "message": "Type inconnu"}), 404
+    import_format = _import_format()
+    if not import_format:
+        return jsonify({"status": "error", "message": "Format non supporté (csv, json, ndjson)"}), 415
+
+    table, build_row, _ = BULK_KINDS[kind]
+    user_id = current_user["id"]
+    dry_run = request.args.get("dry_run") in {"1", "true"}
+    inserted = 0
+    errors: List[Dict[str, Any]] = []
+    error_count = 0
+    earnings: Dict[date, List[float]] = {}
+    number = 0
+
+    try:
+        with engine.begin() as conn:
+            batch: List[Dict[str, Any]] = []
+            for number, record in enumerate(_iter_import_records(request.stream, import_format), start=1):
+                try:
+                    if isinstance(record, Exception):
+                        raise record
+                    if not isinstance(record, dict):
+                        raise ValueError("Objet attendu")
+                    row = build_row(record, user_id)
+                except ValueError as exc:
+                    error_count += 1
+                    if len(errors) < IMPORT_MAX_ERRORS:
+                        errors.append({"row": number, "message": str(exc)})
+                    continue
+
+                if kind == "performances":
+                    month = earnings.setdefault(row["performance_date"].replace(day=1), [0.0, 0])
+                    month[0] += row["fee"]
+                    month[1] += 1
+                batch.append(row)
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    if not dry_run:
+                        _bulk_insert(conn, table, batch)
+                    inserted += len(batch)
+                    batch = []
+
+            if batch and not dry_run:
+                _bulk_insert(conn, table, batch)
+            inserted += len(batch)
+            if not dry_run:
+                # One rollup update per month touched, not per row.
+                for month, (total, count) in earnings.items():
+                    _record_earnings(conn, user_id, month, total, int(count))
+                if inserted:
+                    bump_workspace(conn, user_id, kind)
+                if inserted and kind in {"events", "performances"}:
+                    invalidate_availability(conn)
+    except ValueError as exc:
+        # The JSON array or CSV itself is malformed; nothing was committed.
+        return jsonify({"status": "error", "message": f"{exc} après l'élément {number}", "inserted": 0}), 400
+    return jsonify(
+        {
+            "status": "ok" if not error_count else "partial",
+            "dry_run": dry_run,
+            "inserted": inserted,
+            "error_count": error_count,
+            "errors": errors,
+        }
+    )
+
+
+@app.route("/api/export/<kind>")
+def bulk_export(kind: str):
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    if kind not in BULK_KINDS:
+        return jsonify({"status": "error", "message": "Type inconnu"}), 404
+
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in {"csv", "ndjson"}:
+        return jsonify({"status": "error", "message": "Format non supporté (csv, ndjson)"}), 400
+
+    table, _, order_by = BULK_KINDS[kind]
+    query = select(table).where(table.c.user_id == current_user["id"]).order_by(*order_by)
+    columns = [column.name for column in table.c]
+
+    def generate() -> Iterator[str]:
+        # Rows are fetched EXPORT_BATCH_SIZE at a time from a server-side
+        # cursor and written out batch by batch.
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(query)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if export_format == "csv":
+                writer.writerow(columns)
+            for partition in result.partitions():
+                for row in partition:
+                    values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in row]
+                    if export_format == "csv":
+                        writer.writerow(values)
+                    else:
+                        buffer.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False) + "\n")
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+
+    mimetype = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{kind}.{export_format}"'},
+    )
+
+
+MESSAGES_PAGE_SIZE = int(os.getenv("MESSAGES_PAGE_SIZE", "100"))
+MESSAGES_POLL_INTERVAL = float(os.getenv("MESSAGES_POLL_INTERVAL", "3"))
+MESSAGES_STREAM_TIMEOUT = float(os.getenv("MESSAGES_STREAM_TIMEOUT", "25"))
+
+
+class MessageNotifier:
+    """Wakes chat streams in this worker as soon as a message is sent.
+
+    Messages sent through other workers are picked up by the stream's
+    periodic poll instead, so this is only a latency shortcut.
+    """
+
+    def __init__(self) -> None:
+        self.latest_id = 0
+        self._condition = threading.Condition()
+
+    def publish(self, message_id: int) -> None:
+        with self._condition:
+            self.latest_id = max(self.latest_id, message_id)
+            self._condition.notify_all()
+
+    def wait(self, after: int, timeout: float) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: self.latest_id > after, timeout)
+
+
+message_notifier = MessageNotifier()
+
+
+def _message_dict(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+
+def _messages_after(user_id: int, after: int, limit: int = MESSAGES_PAGE_SIZE) -> List[Dict[str, Any]]:
+    # Both branches of the OR are range scans on the (recipient_id, id) and
+    # (sender_id, id) indexes.
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(messages)
+            .where((messages.c.sender_id == user_id) | (messages.c.recipient_id == user_id))
+            .where(messages.c.id > after)
+            .order_by(messages.c.id)
+            .limit(limit)
+        ).mappings()
+        return [_message_dict(row) for row in rows]
+
+
+def _message_cursor() -> int:
+    # EventSource reconnects to the URL it was opened with, so its stale
+    # ``after`` must yield to the Last-Event-ID it sends alongside.
+    raw = request.headers.get("Last-Event-ID") or request.args.get("after") or "0"
+    try:
+        return max(int(raw), 0)
+    except ValueError:
+        return 0
+
+
+@app.route("/api/messages")
+def list_messages():
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    after = _message_cursor()
+    limit = request.args.get("limit", MESSAGES_PAGE_SIZE, type=int) or MESSAGES_PAGE_SIZE
+    limit = min(limit, MESSAGES_PAGE_SIZE)
+    items = _messages_after(current_user["id"], after, limit)
+    return jsonify({"messages": items, "last_id": items[-1]["id"] if items else after})
+
+
+@app.route("/api/messages/stream")
+def stream_messages():
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    user_id = current_user["id"]
+    after = _message_cursor()
+
+    def generate() -> Iterator[str]:
+        nonlocal after
+        # Each stream is bounded so it never pins a worker for long; the
+        # browser's EventSource reconnects with Last-Event-ID on its own.
+        deadline = time.monotonic() + MESSAGES_STREAM_TIMEOUT
+        yield f"retry: {int(MESSAGES_POLL_INTERVAL * 1000)}\n\n"
+        while time.monotonic() < deadline:
+            items = _messages_after(user_id, after)
+            for item in items:
+                after = item["id"]
+                yield f"id: {after}\nevent: message\ndata: {json.dumps(item, ensure_ascii=False)}\n\n"
+            if not items:
+                yield ": keepalive\n\n"
+            message_notifier.wait(after, min(MESSAGES_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/api/messages", methods=["POST"])
 def send_message():
     current_user = get_current_user()
@@ -914,33 +3928,590 @@ def send_message():
         return jsonify({"status": "error", "message": "Message vide"}), 400
 
     with engine.begin() as conn:
-        conn.execute(
-            messages.insert().values(
+        row = conn.execute(
+            messages.insert()
+            .values(
                 sender_id=current_user["id"],
                 recipient_id=int(recipient_id) if recipient_id else None,
                 body=body,
                 is_to_moderator=to_moderator,
             )
+            .returning(*messages.c)
+        ).mappings().one()
+        if to_moderator:
+            _record_moderator_message(conn, row)
+        bump_workspace(conn, row["sender_id"], "messages")
+        if row["recipient_id"] and row["recipient_id"] != row["sender_id"]:
+            bump_workspace(conn, row["recipient_id"], "messages")
+    message_notifier.publish(row["id"])
+    return jsonify({"status": "ok", "message": _message_dict(row)})
+
+
+MODERATOR_PAGE_SIZE = int(os.getenv("MODERATOR_PAGE_SIZE", "50"))
+
+
+def _upsert_insert(table: Table):
+    # Both backends support INSERT ... ON CONFLICT through their dialect insert.
+    return (postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert)(table)
+
+
+def _record_moderator_message(conn, row: Dict[str, Any]) -> None:
+    # Keeps the per-conversation aggregates current in the same transaction
+    # as the message, so the inbox never has to aggregate ``messages``.
+    stmt = _upsert_insert(moderator_conversations).values(
+        user_id=row["sender_id"],
+        last_message_id=row["id"],
+        last_message_at=row["created_at"],
+        last_body=row["body"],
+        message_count=1,
+        unread_count=1,
+    )
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[moderator_conversations.c.user_id],
+            set_={
+                "last_message_id": stmt.excluded.last_message_id,
+                "last_message_at": stmt.excluded.last_message_at,
+                "last_body": stmt.excluded.last_body,
+                "message_count": moderator_conversations.c.message_count + 1,
+                "unread_count": moderator_conversations.c.unread_count + 1,
+            },
         )
+    )
+
+
+def _moderator_user() -> Dict[str, Any] | None:
+    current_user = get_current_user()
+    if not current_user or current_user.get("role") not in {"admin", "moderator"}:
+        return None
+    return current_user
+
+
+def _moderator_page_args() -> Tuple[int | None, int]:
+    limit = request.args.get("limit", MODERATOR_PAGE_SIZE, type=int) or MODERATOR_PAGE_SIZE
+    return request.args.get("before", type=int), max(1, min(limit, MODERATOR_PAGE_SIZE))
+
+
+@app.route("/api/moderator/inbox")
+def moderator_inbox():
+    if not _moderator_user():
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+
+    before, limit = _moderator_page_args()
+    query = (
+        select(moderator_conversations, users.c.name, users.c.email)
+        .join(users, users.c.id == moderator_conversations.c.user_id)
+        .order_by(moderator_conversations.c.last_message_id.desc())
+        .limit(limit + 1)
+    )
+    if before:
+        query = query.where(moderator_conversations.c.last_message_id < before)
+    if request.args.get("unread") in {"1", "true"}:
+        query = query.where(moderator_conversations.c.unread_count > 0)
+
+    with engine.connect() as conn:
+        rows = [_message_dict(row) for row in conn.execute(query).mappings()]
+        total_unread = conn.execute(
+            select(func.coalesce(func.sum(moderator_conversations.c.unread_count), 0))
+        ).scalar()
+
+    page = rows[:limit]
+    return jsonify(
+        {
+            "conversations": page,
+            "unread": total_unread,
+            "next_before": page[-1]["last_message_id"] if len(rows) > limit else None,
+        }
+    )
+
+
+@app.route("/api/moderator/inbox/<int:user_id>")
+def moderator_conversation(user_id: int):
+    if not _moderator_user():
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+
+    before, limit = _moderator_page_args()
+    query = (
+        select(messages)
+        .where(messages.c.sender_id == user_id, messages.c.is_to_moderator)
+        .order_by(messages.c.id.desc())
+        .limit(limit + 1)
+    )
+    if before:
+        query = query.where(messages.c.id < before)
+
+    with engine.connect() as conn:
+        rows = [_message_dict(row) for row in conn.execute(query).mappings()]
+        read_marker = conn.execute(
+            select(moderator_conversations.c.last_read_message_id).where(
+                moderator_conversations.c.user_id == user_id
+            )
+        ).scalar()
+
+    page = rows[:limit]
+    for item in page:
+        item["unread"] = item["id"] > (read_marker or 0)
+    return jsonify({"messages": page, "next_before": page[-1]["id"] if len(rows) > limit else None})
+
+
+@app.route("/api/moderator/inbox/<int:user_id>/read", methods=["POST"])
+def mark_conversation_read(user_id: int):
+    moderator = _moderator_user()
+    if not moderator:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+
+    with engine.begin() as conn:
+        result = conn.execute(
+            moderator_conversations.update()
+            .where(moderator_conversations.c.user_id == user_id)
+            .values(
+                last_read_message_id=moderator_conversations.c.last_message_id,
+                unread_count=0,
+                read_by=moderator["id"],
+            )
+        )
+    if not result.rowcount:
+        return jsonify({"status": "error", "message": "Conversation introuvable"}), 404
     return jsonify({"status": "ok"})
 
 
+@app.route("/api/moderator/messages")
+def moderator_queue():
+    # Raw queue of messages addressed to moderators, newest first. The
+    # (is_to_moderator, created_at, id) index serves both the filter and the
+    # keyset order; ``before`` is the id of the last message already seen.
+    if not _moderator_user():
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+
+    before, limit = _moderator_page_args()
+    query = (
+        select(messages)
+        .where(messages.c.is_to_moderator)
+        .order_by(messages.c.created_at.desc(), messages.c.id.desc())
+        .limit(limit + 1)
+    )
+    with engine.connect() as conn:
+        if before:
+            anchor = conn.execute(select(messages.c.created_at).where(messages.c.id == before)).scalar()
+            if anchor is not None:
+                query = query.where(
+                    (messages.c.created_at < anchor)
+                    | ((messages.c.created_at == anchor) & (messages.c.id < before))
+                )
+        rows = [_message_dict(row) for row in conn.execute(query).mappings()]
+
+    page = rows[:limit]
+    return jsonify({"messages": page, "next_before": page[-1]["id"] if len(rows) > limit else None})
+
+
 @app.route("/uploads/<path:filename>")
 def serve_uploads(filename: str):
-    return send_from_directory(UPLOAD_DIR, filename)
+    return _serve_media(UPLOAD_DIR, filename, immutable=filename.startswith(f"{UPLOAD_BLOB_DIR.name}/"))
+
+
+@app.route("/derivatives/<path:filename>")
+def serve_derivatives(filename: str):
+    # Only the images themselves; manifests, locks and temp files stay private.
+    if Path(filename).suffix.lower() not in DERIVATIVE_SUFFIXES or Path(filename).name.startswith("."):
+        return jsonify({"status": "error", "message": "Not found"}), 404
+    return _serve_media(DERIVATIVE_DIR, filename, immutable=True)
+
+
+def _metrics_authorized() -> bool:
+    # Metrics include slow SQL text, so without a token they are only served
+    # to local clients (a sidecar scraper, or curl on the host). No proxy fix
+    # is installed, so remote_addr is the direct peer and cannot be forged.
+    token = os.getenv("METRICS_TOKEN")
+    if not token:
+        return request.remote_addr in {"127.0.0.1", "::1"}
+    return secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+
+
+@app.route("/metrics/db")
+def db_metrics():
+    if not _metrics_authorized():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    return jsonify(pool_stats.snapshot(engine.pool))
+
+
+INSTRUMENTATION_ENABLED = _env_flag("INSTRUMENTATION_ENABLED", True)
+SERVER_TIMING_ENABLED = _env_flag("SERVER_TIMING_ENABLED", True)
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+SLOW_REQUEST_MAX_QUERIES = 50
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """Per-endpoint latency histograms and DB/template time, per process.
+
+    Keyed by endpoint name rather than path, so ids in URLs don't create new
+    series.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.latency: Dict[Tuple[str, str], List[Any]] = {}
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+        self.work: Dict[str, List[float]] = {}
+        self.slow_requests = 0
+        self.lock = threading.Lock()
+
+    def observe(self, endpoint: str, method: str, status: int, seconds: float, timing: Dict[str, Any]) -> None:
+        with self.lock:
+            histogram = self.latency.get((endpoint, method))
+            if histogram is None:
+                histogram = self.latency[(endpoint, method)] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram[1] += seconds
+            self.responses[(endpoint, method, status)] = self.responses.get((endpoint, method, status), 0) + 1
+            work = self.work.setdefault(endpoint, [0, 0.0, 0.0])
+            work[0] += timing["queries"]
+            work[1] += timing["db_ms"] / 1000
+            work[2] += timing["template_ms"] / 1000
+
+    def prometheus(self) -> List[str]:
+        with self.lock:
+            latency = {key: ([*counts], total) for key, (counts, total) in self.latency.items()}
+            responses = dict(self.responses)
+            work = {key: list(values) for key, values in self.work.items()}
+            slow = self.slow_requests
+
+        lines = [
+            "# HELP http_request_duration_seconds Time from request start to response headers.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (endpoint, method), (counts, total) in sorted(latency.items()):
+            labels = f'endpoint="{endpoint}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+        lines += ["# HELP http_requests_total Responses by status.", "# TYPE http_requests_total counter"]
+        for (endpoint, method, status), count in sorted(responses.items()):
+            lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+        for index, (name, help_text) in enumerate(
+            [
+                ("http_request_db_queries_total", "SQL statements run while handling requests."),
+                ("http_request_db_seconds_total", "Time spent in SQL while handling requests."),
+                ("http_request_template_seconds_total", "Time spent rendering templates."),
+            ]
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for endpoint, values in sorted(work.items()):
+                value = values[index]
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {value if index == 0 else f"{value:.6f}"}')
+        lines += [
+            "# HELP http_slow_requests_total Requests slower than SLOW_REQUEST_MS.",
+            "# TYPE http_slow_requests_total counter",
+            f"http_slow_requests_total {slow}",
+        ]
+        return lines
+
+
+request_metrics = RequestMetrics(LATENCY_BUCKETS)
+
+
+def _record_query(statement: str, elapsed_ms: float) -> None:
+    timing = g.get("request_timing")
+    if timing is None:
+        return
+    timing["queries"] += 1
+    timing["db_ms"] += elapsed_ms
+    if len(timing["statements"]) < SLOW_REQUEST_MAX_QUERIES:
+        timing["statements"].append((statement, elapsed_ms))
+
+
+def _request_started(sender, **extra) -> None:
+    g.request_timing = {
+        "started": time.perf_counter(),
+        "queries": 0,
+        "db_ms": 0.0,
+        "template_ms": 0.0,
+        "template_started": [],
+        "statements": [],
+    }
+
+
+def _template_started(sender, template, context, **extra) -> None:
+    timing = g.get("request_timing")
+    if timing is not None:
+        timing["template_started"].append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra) -> None:
+    timing = g.get("request_timing")
+    if timing is not None and timing["template_started"]:
+        timing["template_ms"] += (time.perf_counter() - timing["template_started"].pop()) * 1000
+
+
+def _request_failed(sender, exception, **extra) -> None:
+    timing = g.get("request_timing")
+    if timing is not None:
+        timing["exception"] = type(exception).__name__
+
+
+def _request_finished(sender, response, **extra) -> None:
+    timing = g.pop("request_timing", None)
+    if timing is None:
+        return
+    elapsed_ms = (time.perf_counter() - timing["started"]) * 1000
+    endpoint = request.endpoint or "unmatched"
+    request_metrics.observe(endpoint, request.method, response.status_code, elapsed_ms / 1000, timing)
+
+    # Generated bodies of unknown length (SSE, exports) do their work after
+    # this point, so a header would only describe the time to first byte.
+    if SERVER_TIMING_ENABLED and not (response.is_streamed and response.content_length is None):
+        response.headers["Server-Timing"] = (
+            f'db;dur={timing["db_ms"]:.2f};desc="{timing["queries"]} queries", '
+            f'tpl;dur={timing["template_ms"]:.2f}, '
+            f"app;dur={elapsed_ms:.2f}"
+        )
+
+    if elapsed_ms >= SLOW_REQUEST_MS:
+        with request_metrics.lock:
+            request_metrics.slow_requests += 1
+        slowest = sorted(timing["statements"], key=lambda item: item[1], reverse=True)[:10]
+        print(
+            "Slow request "
+            + json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.full_path.rstrip("?"),
+                    "endpoint": endpoint,
+                    "status": response.status_code,
+                    "duration_ms": round(elapsed_ms, 3),
+                    "queries": timing["queries"],
+                    "db_ms": round(timing["db_ms"], 3),
+                    "template_ms": round(timing["template_ms"], 3),
+                    "exception": timing.get("exception"),
+                    "slowest_queries": [
+                        {"statement": " ".join(statement.split())[:300], "duration_ms": round(ms, 3)}
+                        for statement, ms in slowest
+                    ],
+                }
+            )
+        )
+
+
+if INSTRUMENTATION_ENABLED:
+    # Disabled means not connected at all: no per-request work beyond one
+    # flag check per SQL statement.
+    request_started.connect(_request_started, app)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    got_request_exception.connect(_request_failed, app)
+    request_finished.connect(_request_finished, app)
+
+
+def _prometheus_gauges(prefix: str, values: Dict[str, Any], counters: set) -> List[str]:
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        kind = "counter" if key in counters else "gauge"
+        name = f"{prefix}_{key.replace('_total', '')}_total" if kind == "counter" else f"{prefix}_{key}"
+        lines += [f"# TYPE {name} {kind}", f"{name} {value}"]
+    return lines
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    if not _metrics_authorized():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    lines = request_metrics.prometheus() if INSTRUMENTATION_ENABLED else []
+    pool = pool_stats.snapshot(engine.pool)
+    pool.pop("slow_query_threshold_ms", None)
+    lines += _prometheus_gauges("db_pool", pool, {"connects", "checkouts", "invalidated"})
+    lines += _prometheus_gauges("mail_queue", mail_queue.stats, {"queued", "sent", "retried", "failed"})
+    lines += _prometheus_gauges(
+        "inquiry_ingester",
+        inquiry_ingester.snapshot(),
+        {"appended", "ingested", "duplicates", "rejected", "batches"},
+    )
+    lines += _prometheus_gauges(
+        "password_hasher",
+        password_hasher.snapshot(),
+        {"hashes", "verified", "failed", "rehashed", "rejected", "hash_total_ms", "wait_total_ms"},
+    )
+    lines += _prometheus_gauges("page_cache", page_cache.snapshot(), {"hits", "disk_hits", "renders", "bypassed"})
+    lines += _prometheus_gauges("asset_catalog", asset_catalog.snapshot(), {"hits", "misses", "rebuilds"})
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/metrics/pages")
+def page_metrics():
+    if not _metrics_authorized():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    return jsonify(page_cache.snapshot())
+
+
+@app.route("/metrics/auth")
+def auth_metrics():
+    if not _metrics_authorized():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    return jsonify(password_hasher.snapshot())
+
+
+def _weekday_set(raw: str) -> set[int]:
+    return {int(part) for part in raw.split(",") if part.strip()}
+
+
+def _date_ranges(raw: str) -> List[Tuple[date, date]]:
+    ranges = []
+    for part in filter(None, (item.strip() for item in raw.split(","))):
+        low, _, high = part.partition("..")
+        ranges.append((date.fromisoformat(low), date.fromisoformat(high or low)))
+    return ranges
+
+
+BOOKING_DAILY_CAPACITY = int(os.getenv("BOOKING_DAILY_CAPACITY", "2"))
+BOOKING_LIMITED_CAPACITY = int(os.getenv("BOOKING_LIMITED_CAPACITY", "1"))
+BOOKING_LIMITED_WEEKDAYS = _weekday_set(os.getenv("BOOKING_LIMITED_WEEKDAYS", "0,2,4,6"))
+BOOKING_CLOSED_WEEKDAYS = _weekday_set(os.getenv("BOOKING_CLOSED_WEEKDAYS", ""))
+BOOKING_BLACKOUTS = _date_ranges(os.getenv("BOOKING_BLACKOUTS", ""))
+BOOKING_DEFAULT_DAYS = 44
+BOOKING_MAX_RANGE_DAYS = int(os.getenv("BOOKING_MAX_RANGE_DAYS", "732"))
+AVAILABILITY_CACHE_TTL = float(os.getenv("AVAILABILITY_CACHE_TTL", "30"))
+AVAILABILITY_CACHE_SIZE = 64
+
+_availability_cache: "OrderedDict[Tuple[date, date], Tuple[int, float, PrecompressedBody]]" = OrderedDict()
+_availability_lock = threading.Lock()
+
+
+def invalidate_availability(conn) -> None:
+    """Invalidate cached availability in every worker.
+
+    Bumps the shared ``availability`` stamp inside the caller's write
+    transaction; each worker compares it with the stamp its entries were
+    computed under before serving them.
+    """
+    stmt = _upsert_insert(cache_versions).values(name="availability", version=1)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[cache_versions.c.name],
+            set_={"version": cache_versions.c.version + 1},
+        )
+    )
+
+
+def _availability_version() -> int:
+    with engine.connect() as conn:
+        version = conn.execute(
+            select(cache_versions.c.version).where(cache_versions.c.name == "availability")
+        ).scalar()
+    return version or 0
+
+
+def _weekday_mask(start: date, days: int, weekdays: set[int]) -> int:
+    # Bit i is set when start + i days falls on one of ``weekdays``: one week
+    # of bits is laid down and then doubled until it covers the range.
+    mask = sum(1 << offset for offset in range(7) if (start.weekday() + offset) % 7 in weekdays)
+    width = 7
+    while width < days:
+        mask |= mask << width
+        width *= 2
+    return mask & ((1 << days) - 1)
+
+
+def _date_range_mask(start: date, days: int, ranges: List[Tuple[date, date]]) -> int:
+    mask = 0
+    for low, high in ranges:
+        first = max((low - start).days, 0)
+        last = min((high - start).days, days - 1)
+        if first <= last:
+            mask |= ((1 << (last - first + 1)) - 1) << first
+    return mask
+
+
+def _booking_counts(start: date, end: date) -> Dict[date, int]:
+    # Events and performances both take a slot; the date indexes keep this a
+    # range scan however large the tables get.
+    booked = union_all(
+        select(events.c.event_date.label("day"), func.count().label("total"))
+        .where(events.c.event_date.between(start, end))
+        .group_by(events.c.event_date),
+        select(performances.c.performance_date, func.count())
+        .where(performances.c.performance_date.between(start, end))
+        .group_by(performances.c.performance_date),
+    )
+    counts: Dict[date, int] = {}
+    with engine.connect() as conn:
+        for day, total in conn.execute(booked):
+            counts[day] = counts.get(day, 0) + total
+    return counts
+
+
+def compute_availability(start: date, end: date) -> List[Dict[str, Any]]:
+    days = (end - start).days + 1
+    every_day = (1 << days) - 1
+    closed = _weekday_mask(start, days, BOOKING_CLOSED_WEEKDAYS) | _date_range_mask(start, days, BOOKING_BLACKOUTS)
+    limited_days = _weekday_mask(start, days, BOOKING_LIMITED_WEEKDAYS) & ~closed
+    open_days = every_day & ~closed & ~limited_days
+
+    # at_least[k] has bit i set when day i already holds k or more bookings.
+    counts = _booking_counts(start, end)
+    top = max(BOOKING_DAILY_CAPACITY, BOOKING_LIMITED_CAPACITY)
+    at_least = [every_day] + [0] * top
+    for day, total in counts.items():
+        bit = 1 << (day - start).days
+        for level in range(1, min(total, top) + 1):
+            at_least[level] |= bit
+
+    booked = (open_days & at_least[BOOKING_DAILY_CAPACITY]) | (limited_days & at_least[BOOKING_LIMITED_CAPACITY])
+    limited = ((open_days & at_least[min(1, top)]) | limited_days) & ~booked
+
+    availability = []
+    for offset in range(days):
+        bit = 1 << offset
+        day = start + timedelta(days=offset)
+        if closed & bit:
+            status, capacity = "unavailable", 0
+        else:
+            capacity = BOOKING_LIMITED_CAPACITY if limited_days & bit else BOOKING_DAILY_CAPACITY
+            status = "booked" if booked & bit else "limited" if limited & bit else "available"
+        availability.append(
+            {"date": day.isoformat(), "status": status, "remaining": max(capacity - counts.get(day, 0), 0)}
+        )
+    return availability
 
 
 @app.route("/booking/availability")
 def booking_availability():
     today = date.today()
-    availability = []
-    for offset in range(1, 45):
-        day = today + timedelta(days=offset)
-        if day.weekday() in {1, 3, 5}:
-            availability.append({"date": day.isoformat(), "status": "available"})
-        else:
-            availability.append({"date": day.isoformat(), "status": "limited"})
-    return jsonify({"availability": availability})
+    try:
+        start = date.fromisoformat(request.args["from"]) if "from" in request.args else today + timedelta(days=1)
+        end = (
+            date.fromisoformat(request.args["to"])
+            if "to" in request.args
+            else start + timedelta(days=BOOKING_DEFAULT_DAYS - 1)
+        )
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates invalides (AAAA-MM-JJ)"}), 400
+    if end < start or (end - start).days >= BOOKING_MAX_RANGE_DAYS:
+        return jsonify({"status": "error", "message": "Période invalide"}), 400
+
+    key = (start, end)
+    now = time.monotonic()
+    # One primary-key lookup per request, against a grouped scan of two tables.
+    version = _availability_version()
+    with _availability_lock:
+        cached = _availability_cache.get(key)
+        if cached and cached[0] == version and now - cached[1] < AVAILABILITY_CACHE_TTL:
+            _availability_cache.move_to_end(key)
+            return _precompressed_response(cached[2])
+
+    body = PrecompressedBody(
+        {"from": start.isoformat(), "to": end.isoformat(), "availability": compute_availability(start, end)},
+        last_modified=datetime.now(timezone.utc),
+    )
+    with _availability_lock:
+        _availability_cache[key] = (version, now, body)
+        while len(_availability_cache) > AVAILABILITY_CACHE_SIZE:
+            _availability_cache.popitem(last=False)
+    return _precompressed_response(body)
 
 
 if __name__ == "__main__":
@@ -1,3 +1,9 @@
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  applied_at TIMESTAMP
+);
+
 CREATE TABLE IF NOT EXISTS users (
   id SERIAL PRIMARY KEY,
   email TEXT UNIQUE NOT NULL,
@@ -57,8 +63,41 @@ CREATE TABLE IF NOT EXISTS messages (
   is_to_moderator BOOLEAN DEFAULT FALSE
 );
 
+CREATE TABLE IF NOT EXISTS moderator_conversations (
+  user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+  last_message_id INTEGER NOT NULL,
+  last_message_at TIMESTAMPTZ,
+  last_body TEXT,
+  message_count INTEGER NOT NULL DEFAULT 0,
+  unread_count INTEGER NOT NULL DEFAULT 0,
+  last_read_message_id INTEGER,
+  read_by INTEGER REFERENCES users(id)
+);
+
+-- user_id 0 holds the agency-wide totals.
+CREATE TABLE IF NOT EXISTS earnings_monthly (
+  user_id INTEGER NOT NULL,
+  month DATE NOT NULL,
+  total NUMERIC(12,2) NOT NULL DEFAULT 0,
+  performance_count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, month)
+);
+
+CREATE TABLE IF NOT EXISTS workspace_versions (
+  user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  section TEXT NOT NULL,
+  version INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, section)
+);
+
+CREATE TABLE IF NOT EXISTS cache_versions (
+  name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0
+);
+
 CREATE TABLE IF NOT EXISTS inquiries (
   id SERIAL PRIMARY KEY,
+  inquiry_key TEXT UNIQUE,
   client_name TEXT NOT NULL,
   email TEXT NOT NULL,
   event_type TEXT NOT NULL,
@@ -66,3 +105,30 @@ CREATE TABLE IF NOT EXISTS inquiries (
   message TEXT NOT NULL,
   created_at TIMESTAMPTZ DEFAULT NOW()
 );
+
+CREATE TABLE IF NOT EXISTS asset_index (
+  id SERIAL PRIMARY KEY,
+  path TEXT UNIQUE NOT NULL,
+  content_hash TEXT NOT NULL,
+  size_bytes BIGINT NOT NULL,
+  mtime_ns BIGINT NOT NULL,
+  asset_type TEXT NOT NULL,
+  width INTEGER,
+  height INTEGER,
+  duration DOUBLE PRECISION,
+  codec TEXT,
+  indexed_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_asset_index_content_hash ON asset_index (content_hash);
+CREATE INDEX IF NOT EXISTS ix_subscriptions_user_id_id ON subscriptions (user_id, id);
+CREATE INDEX IF NOT EXISTS ix_events_user_id_event_date ON events (user_id, event_date, id);
+CREATE INDEX IF NOT EXISTS ix_performances_user_id_performance_date ON performances (user_id, performance_date, id);
+CREATE INDEX IF NOT EXISTS ix_media_assets_user_id_uploaded_at ON media_assets (user_id, uploaded_at, id);
+CREATE INDEX IF NOT EXISTS ix_media_assets_user_id_url ON media_assets (user_id, url);
+CREATE INDEX IF NOT EXISTS ix_events_event_date ON events (event_date);
+CREATE INDEX IF NOT EXISTS ix_performances_performance_date ON performances (performance_date);
+CREATE INDEX IF NOT EXISTS ix_messages_recipient_id_id ON messages (recipient_id, id);
+CREATE INDEX IF NOT EXISTS ix_messages_sender_id_id ON messages (sender_id, id);
+CREATE INDEX IF NOT EXISTS ix_messages_is_to_moderator_created_at ON messages (is_to_moderator, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_moderator_conversations_last_message_id ON moderator_conversations (last_message_id);
@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""Load and latency benchmark for every route.
+
+Boots the app in a subprocess (gunicorn with gthread workers when it is
+installed, Werkzeug's threaded server otherwise) against a seeded SQLite
+database, a synthetic ``assets/`` tree and a local stub SMTP server. Each
+route is then driven by concurrent keep-alive clients, and the results are
+written as JSON for comparison between commits:
+
+    python scripts/benchmark.py [--assets 200] [--concurrency 16] [--requests 300]
+    python scripts/benchmark.py --compare bench_results/<earlier>.json
+
+Peak RSS is read from /proc, so it is only reported on Linux.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "bench_results"
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    """Accepts and counts messages; just enough SMTP for smtplib."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StubSMTPHandler)
+        self.messages = 0
+        self.lock = threading.Lock()
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        self.wfile.write(b"220 bench ESMTP\r\n")
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line.rstrip(b"\r\n") == b".":
+                    in_data = False
+                    with self.server.lock:
+                        self.server.messages += 1
+                    self.wfile.write(b"250 queued\r\n")
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.wfile.write(b"250-bench\r\n250 8BITMIME\r\n")
+            elif command == b"DATA":
+                in_data = True
+                self.wfile.write(b"354 end with .\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 ok\r\n")
+
+
+def _mp4_bytes(size: int, rng: random.Random) -> bytes:
+    # ftyp + moov/mvhd + mdat: enough structure for the app's MP4 probe.
+    ftyp = struct.pack(">I4s4sI4s4s", 24, b"ftyp", b"isom", 512, b"isom", b"mp41")
+    mvhd_payload = struct.pack(">B3xIIII", 0, 0, 0, 1000, 30_000) + bytes(80)
+    mvhd = struct.pack(">I4s", 8 + len(mvhd_payload), b"mvhd") + mvhd_payload
+    moov = struct.pack(">I4s", 8 + len(mvhd), b"moov") + mvhd
+    body_size = max(size - len(ftyp) - len(moov) - 8, 0)
+    mdat = struct.pack(">I4s", 8 + body_size, b"mdat") + rng.randbytes(body_size)
+    return ftyp + moov + mdat
+
+
+def _build_assets(directory: Path, count: int, video_bytes: int, rng: random.Random) -> Dict[str, List[str]]:
+    directory.mkdir(parents=True, exist_ok=True)
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+    names: Dict[str, List[str]] = {"image": [], "video": []}
+    for index in range(count):
+        if index % 5 == 4:
+            name = f"bench-video-{index:05d}.mp4"
+            (directory / name).write_bytes(_mp4_bytes(video_bytes, rng))
+            names["video"].append(name)
+        else:
+            name = f"bench-image-{index:05d}.jpg"
+            if Image is not None:
+                color = tuple(rng.randrange(256) for _ in range(3))
+                Image.new("RGB", (640, 400), color).save(directory / name, quality=80)
+            else:
+                (directory / name).write_bytes(rng.randbytes(40_000))
+            names["image"].append(name)
+    return names
+
+
+def _seed(app_module, users: int, rows_per_user: int, rng: random.Random) -> None:
+    today = date.today()
+    now = datetime.utcnow()
+    with app_module.engine.begin() as conn:
+        first_id = conn.execute(app_module.select(app_module.func.max(app_module.users.c.id))).scalar() + 1
+        seeded = list(range(first_id, first_id + users))
+        conn.execute(
+            app_module.users.insert(),
+            [
+                {
+                    "id": user_id,
+                    "email": f"bench{user_id}@example.com",
+                    "password_hash": "x",
+                    "name": f"Bench {user_id}",
+                    "role": "community",
+                }
+                for user_id in seeded
+            ],
+        )
+        # The artist account (id 3) is the one the workspace routes log in as.
+        owners = seeded + [3]
+        conn.execute(
+            app_module.events.insert(),
+            [
+                {
+                    "user_id": user_id,
+                    "title": "Event",
+                    "event_date": today + timedelta(days=rng.randint(-400, 400)),
+                    "location": "Paris",
+                }
+                for user_id in owners
+                for _ in range(rows_per_user)
+            ],
+        )
+        conn.execute(
+            app_module.performances.insert(),
+            [
+                {
+                    "user_id": user_id,
+                    "title": "Show",
+                    "performance_date": today - timedelta(days=rng.randint(0, 1500)),
+                    "fee": rng.randint(100, 3000),
+                }
+                for user_id in owners
+                for _ in range(rows_per_user)
+            ],
+        )
+        conn.execute(
+            app_module.media_assets.insert(),
+            [
+                {
+                    "user_id": user_id,
+                    "media_type": "image",
+                    "url": f"/uploads/{user_id}-{index}.jpg",
+                    "uploaded_at": now - timedelta(minutes=rng.randint(0, 500000)),
+                }
+                for user_id in owners
+                for index in range(rows_per_user)
+            ],
+        )
+        conn.execute(
+            app_module.messages.insert(),
+            [
+                {
+                    "sender_id": rng.choice(owners),
+                    "recipient_id": rng.choice(owners),
+                    "body": "Bonjour",
+                    "created_at": now - timedelta(minutes=rng.randint(0, 500000)),
+                    "is_to_moderator": rng.random() < 0.1,
+                }
+                for _ in range(len(owners) * rows_per_user)
+            ],
+        )
+        app_module._migrate_moderator_conversations(conn)
+        app_module.rebuild_earnings_rollups(conn)
+        conn.exec_driver_sql("ANALYZE")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(
+    port: int, server: str, workers: int, threads: int, env: Dict[str, str], log_path: Path
+) -> Tuple[subprocess.Popen, str]:
+    if server == "auto":
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn"
+        except ImportError:
+            server = "werkzeug"
+    if server == "gunicorn":
+        command = [
+            sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+            "--workers", str(workers), "--worker-class", "gthread", "--threads", str(threads),
+            "--log-level", "warning", "app:app",
+        ]
+    else:
+        command = [
+            sys.executable, "-c",
+            "from werkzeug.serving import run_simple; import app; "
+            f"run_simple('127.0.0.1', {port}, app.app, threaded=True)",
+        ]
+    # The access log goes to a file: an unread pipe fills up and stalls the server.
+    with log_path.open("wb") as log:
+        process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited: {log_path.read_text()[-2000:]}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process, server
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("server did not start within 60 s")
+
+
+class RSSMonitor(threading.Thread):
+    """Samples the summed RSS of a process and its children."""
+
+    def __init__(self, pid: int, interval: float = 0.1) -> None:
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self.stopped = threading.Event()
+
+    def _tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for entry in Path("/proc").iterdir():
+            if not entry.name.isdigit():
+                continue
+            try:
+                ppid = int((entry / "stat").read_text().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry.name))
+        tree, stack = [], [self.pid]
+        while stack:
+            pid = stack.pop()
+            tree.append(pid)
+            stack.extend(children.get(pid, []))
+        return tree
+
+    def _rss_kb(self, pid: int) -> int:
+        try:
+            for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    def run(self) -> None:
+        if not Path("/proc").is_dir():
+            return
+        while not self.stopped.wait(self.interval):
+            self.peak_kb = max(self.peak_kb, sum(self._rss_kb(pid) for pid in self._tree()))
+
+
+class Client:
+    """One keep-alive connection plus an optional session cookie."""
+
+    def __init__(self, port: int, cookie: str | None = None) -> None:
+        self.port = port
+        self.cookie = cookie
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+
+    def request(self, method: str, path: str, body: bytes | None = None, headers: Dict[str, str] | None = None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        for attempt in range(2):
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                return response, data
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection; reconnect once.
+                self.conn.close()
+                if attempt:
+                    raise
+
+
+def _login(port: int, email: str, password: str) -> str:
+    client = Client(port)
+    response, _ = client.request(
+        "POST",
+        "/login",
+        body=urllib.parse.urlencode({"email": email, "password": password}).encode(),
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    cookie = response.getheader("Set-Cookie")
+    if response.status != 302 or not cookie:
+        raise RuntimeError(f"login failed for {email}: {response.status}")
+    return cookie.split(";", 1)[0]
+
+
+Route = Tuple[str, str, Callable[[int], Tuple[str, bytes | None, Dict[str, str]]], str | None]
+
+
+def _routes(assets: Dict[str, List[str]], video_bytes: int) -> List[Route]:
+    json_headers = {"Content-Type": "application/json"}
+    today = date.today()
+
+    def get(path: str, headers: Dict[str, str] | None = None):
+        return lambda n: (path, None, dict(headers or {}))
+
+    def post_json(path: str, build: Callable[[int], Dict[str, Any]]):
+        return lambda n: (path, json.dumps(build(n)).encode(), json_headers)
+
+    def video_range(n: int):
+        name = assets["video"][n % len(assets["video"])]
+        start = (n * 262_144) % max(video_bytes - 1_048_576, 1)
+        return f"/assets/{name}", None, {"Range": f"bytes={start}-{start + 1_048_575}"}
+
+    def image(n: int):
+        return f"/assets/{assets['image'][n % len(assets['image'])]}", None, {}
+
+    routes: List[Route] = [
+        ("home", "GET", get("/", {"Accept-Encoding": "gzip"}), None),
+        ("assets", "GET", get("/assets", {"Accept-Encoding": "gzip"}), None),
+        ("assets_page", "GET", get("/assets?limit=50&asset_type=image"), None),
+        ("milestones", "GET", get("/milestones", {"Accept-Encoding": "gzip"}), None),
+        ("booking_availability", "GET", get("/booking/availability"), None),
+        ("asset_image", "GET", image, None),
+        ("login", "POST", lambda n: (
+            "/login",
+            urllib.parse.urlencode({"email": "artist@abagency.com", "password": "User123!"}).encode(),
+            {"Content-Type": "application/x-www-form-urlencoded"},
+        ), None),
+        ("workspace", "GET", get("/workspace"), "artist"),
+        ("workspace_fragment", "GET", get("/workspace/fragments/events"), "artist"),
+        ("api_workspace", "GET", get("/api/workspace/media?offset=20"), "artist"),
+        ("api_messages", "GET", get("/api/messages?after=0"), "artist"),
+        ("api_earnings", "GET", get("/api/analytics/earnings"), "artist"),
+        ("api_export", "GET", get("/api/export/events?format=ndjson"), "artist"),
+        ("api_moderator_inbox", "GET", get("/api/moderator/inbox"), "moderator"),
+        ("api_events_post", "POST", post_json("/api/events", lambda n: {
+            "title": f"Bench {n}", "event_date": str(today + timedelta(days=n % 365)), "location": "Lyon",
+        }), "artist"),
+        ("api_messages_post", "POST", post_json("/api/messages", lambda n: {"body": f"Bench {n}"}), "artist"),
+        ("inquiry", "POST", post_json("/inquiry", lambda n: {
+            "client_name": f"Client {n}",
+            "email": f"client{n}@example.com",
+            "event_type": "Mariage",
+            "event_date": str(today + timedelta(days=30)),
+            "message": "Benchmark inquiry",
+        }), None),
+    ]
+    if assets["video"]:
+        routes.insert(6, ("asset_video_range", "GET", video_range, None))
+    return routes
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def _run_route(port: int, route: Route, cookies: Dict[str, str], requests: int, concurrency: int, warmup: int):
+    name, method, build, account = route
+    cookie = cookies.get(account) if account else None
+    counter = iter(range(warmup + requests))
+    counter_lock = threading.Lock()
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    transferred = 0
+    results_lock = threading.Lock()
+
+    def worker() -> None:
+        nonlocal transferred
+        client = Client(port, cookie)
+        while True:
+            with counter_lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            path, body, headers = build(n)
+            started = time.perf_counter()
+            try:
+                response, data = client.request(method, path, body, headers)
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                client.conn.close()
+                status, data = 0, b""
+            elapsed = time.perf_counter() - started
+            if n < warmup:
+                continue
+            with results_lock:
+                latencies.append(elapsed * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+                transferred += len(data)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 400)
+    return {
+        "method": method,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+        "p99_ms": round(_percentile(latencies, 0.99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        "bytes": transferred,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(current: Dict[str, Any], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('commit')}):")
+    settings = ("server", "workers", "threads", "concurrency", "requests_per_route", "assets", "video_kb", "users")
+    changed = [key for key in settings if baseline["meta"].get(key) != current["meta"].get(key)]
+    if changed:
+        print(f"Warning: runs used different settings ({', '.join(changed)}); deltas are not like for like.")
+    print(f"{'route':<24}{'p95 ms':>12}{'delta':>10}{'rps':>10}{'delta':>10}")
+    for name, result in current["routes"].items():
+        before = baseline["routes"].get(name)
+        if not before:
+            print(f"{name:<24}{result['p95_ms']:>12.2f}{'new':>10}{result['throughput_rps']:>10.1f}")
+            continue
+        p95_delta = (result["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+        rps_delta = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100 if before["throughput_rps"] else 0.0
+        print(
+            f"{name:<24}{result['p95_ms']:>12.2f}{p95_delta:>+9.1f}%"
+            f"{result['throughput_rps']:>10.1f}{rps_delta:>+9.1f}%"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assets", type=int, default=200, help="files in the synthetic assets/ tree")
+    parser.add_argument("--video-kb", type=int, default=4096, help="size of each synthetic video")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--rows-per-user", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per route")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per route")
+    parser.add_argument("--server", choices=("auto", "gunicorn", "werkzeug"), default="auto")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--routes", help="comma-separated subset of route names")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="defaults to bench_results/<time>-<commit>.json")
+    parser.add_argument("--compare", type=Path, help="earlier result file to diff against")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    video_bytes = args.video_kb * 1024
+    smtp = StubSMTPServer()
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        work = Path(workdir)
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{work / 'bench.db'}",
+            "ASSET_DIR": str(work / "assets"),
+            "INQUIRY_LOG": str(work / "inquiries.jsonl"),
+            "OUTBOX_DIR": str(work / "outbox"),
+            "PAGE_CACHE_DIR": str(work / "page-cache"),
+            "DERIVATIVES_ENABLED": "false",
+            "SMTP_HOST": "127.0.0.1",
+            "SMTP_PORT": str(smtp.server_address[1]),
+            "SMTP_USE_TLS": "false",
+            "SECRET_KEY": "benchmark",
+        }
+        os.environ.update(env)
+        sys.path.insert(0, str(ROOT))
+        import app as app_module
+
+        print("Seeding database and assets...")
+        assets = _build_assets(work / "assets", args.assets, video_bytes, rng)
+        app_module.init_db()
+        _seed(app_module, args.users, args.rows_per_user, rng)
+        app_module.engine.dispose()
+
+        port = _free_port()
+        process, server = _start_server(port, args.server, args.workers, args.threads, env, work / "server.log")
+        monitor = RSSMonitor(process.pid)
+        monitor.start()
+        results: Dict[str, Any] = {}
+        try:
+            cookies = {
+                "artist": _login(port, "artist@abagency.com", "User123!"),
+                "moderator": _login(port, "moderator@abagency.com", "Mod123!"),
+            }
+            wanted = set(args.routes.split(",")) if args.routes else None
+            for route in _routes(assets, video_bytes):
+                if wanted and route[0] not in wanted:
+                    continue
+                result = _run_route(port, route, cookies, args.requests, args.concurrency, args.warmup)
+                results[route[0]] = result
+                print(
+                    f"{route[0]:<24} {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms']:>8.2f}  "
+                    f"p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms  errors {result['errors']}"
+                )
+            # Give the mail queue a moment to drain into the stub server.
+            deadline = time.monotonic() + 10
+            expected = results.get("inquiry", {}).get("requests", 0)
+            while smtp.messages < expected and time.monotonic() < deadline:
+                time.sleep(0.2)
+        finally:
+            monitor.stopped.set()
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            smtp.shutdown()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "server": server,
+            "workers": args.workers if server == "gunicorn" else 1,
+            "threads": args.threads if server == "gunicorn" else None,
+            "concurrency": args.concurrency,
+            "requests_per_route": args.requests,
+            "warmup": args.warmup,
+            "assets": args.assets,
+            "video_kb": args.video_kb,
+            "users": args.users,
+            "rows_per_user": args.rows_per_user,
+            "seed": args.seed,
+        },
+        "peak_rss_mb": round(monitor.peak_kb / 1024, 1) if monitor.peak_kb else None,
+        "smtp_messages": smtp.messages,
+        "routes": results,
+    }
+    output = args.output or RESULTS_DIR / f"{datetime.utcnow():%Y%m%dT%H%M%S}-{report['meta']['commit'] or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nPeak RSS {report['peak_rss_mb']} MB, {smtp.messages} emails delivered to the stub SMTP server")
+    print(f"Results written to {output}")
+    if args.compare:
+        _compare(report, args.compare)
+    return 1 if any(result["errors"] for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Fail if a hot query falls back to a full table scan.
+
+Seeds a throwaway SQLite database with a realistic amount of data, drives the
+workspace, chat and moderator routes through the Flask test client, and runs
+``EXPLAIN QUERY PLAN`` on every SELECT they issue. Any plain ``SCAN <table>``
+of an application table is reported and the script exits non-zero.
+
+    python scripts/check_query_plans.py [--users 300] [--rows-per-user 40]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Tables that are read whole on purpose.
+ALLOWED_SCANS = {
+    "schema_migrations": "read once per boot",
+    "moderator_conversations": "total unread is summed over one row per conversation",
+}
+
+
+def _configure(workdir: Path) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'plans.db'}"
+    os.environ["DERIVATIVES_ENABLED"] = "false"
+    os.environ["INQUIRY_LOG"] = str(workdir / "inquiries.jsonl")
+    os.environ["OUTBOX_DIR"] = str(workdir / "outbox")
+    os.environ.pop("SMTP_HOST", None)
+    sys.path.insert(0, str(ROOT))
+
+
+def _seed(app_module, users: int, rows_per_user: int) -> None:
+    rng = random.Random(42)
+    today = date.today()
+    now = datetime.utcnow()
+    with app_module.engine.begin() as conn:
+        first_id = conn.execute(app_module.select(app_module.func.max(app_module.users.c.id))).scalar() + 1
+        user_ids = list(range(first_id, first_id + users))
+        conn.execute(
+            app_module.users.insert(),
+            [
+                {
+                    "id": user_id,
+                    "email": f"seed{user_id}@example.com",
+                    "password_hash": "x",
+                    "name": f"Seed {user_id}",
+                    "role": "community",
+                }
+                for user_id in user_ids
+            ],
+        )
+        conn.execute(
+            app_module.events.insert(),
+            [
+                {
+                    "user_id": user_id,
+                    "title": "Event",
+                    "event_date": today + timedelta(days=rng.randint(-400, 400)),
+                    "location": "Paris",
+                }
+                for user_id in user_ids
+                for _ in range(rows_per_user)
+            ],
+        )
+        conn.execute(
+            app_module.performances.insert(),
+            [
+                {
+                    "user_id": user_id,
+                    "title": "Show",
+                    "performance_date": today - timedelta(days=rng.randint(0, 1500)),
+                    "fee": rng.randint(100, 3000),
+                }
+                for user_id in user_ids
+                for _ in range(rows_per_user)
+            ],
+        )
+        conn.execute(
+            app_module.media_assets.insert(),
+            [
+                {
+                    "user_id": user_id,
+                    "media_type": "image",
+                    "url": f"/uploads/{user_id}-{index}.jpg",
+                    "uploaded_at": now - timedelta(minutes=rng.randint(0, 500000)),
+                }
+                for user_id in user_ids
+                for index in range(rows_per_user)
+            ],
+        )
+        conn.execute(
+            app_module.messages.insert(),
+            [
+                {
+                    "sender_id": rng.choice(user_ids),
+                    "recipient_id": rng.choice(user_ids),
+                    "body": "Bonjour",
+                    "created_at": now - timedelta(minutes=rng.randint(0, 500000)),
+                    "is_to_moderator": rng.random() < 0.1,
+                }
+                for _ in range(users * rows_per_user)
+            ],
+        )
+        app_module._migrate_moderator_conversations(conn)
+        app_module.rebuild_earnings_rollups(conn)
+        conn.exec_driver_sql("ANALYZE")
+
+
+def _drive(app_module) -> None:
+    artist = app_module.app.test_client()
+    artist.post("/login", data={"email": "artist@abagency.com", "password": "User123!"})
+    artist.get("/workspace")
+    for section in ("events", "performances", "media", "messages"):
+        artist.get(f"/api/workspace/{section}?offset=50")
+    artist.get("/api/messages?after=100")
+    artist.post("/api/messages", json={"body": "Question", "to_moderator": "true"})
+    artist.get("/api/analytics/earnings")
+    artist.get(f"/booking/availability?from={date.today()}&to={date.today() + timedelta(days=365)}")
+
+    moderator = app_module.app.test_client()
+    moderator.post("/login", data={"email": "moderator@abagency.com", "password": "Mod123!"})
+    inbox = moderator.get("/api/moderator/inbox").get_json()
+    moderator.get("/api/moderator/inbox?unread=1")
+    if inbox["next_before"]:
+        moderator.get(f"/api/moderator/inbox?before={inbox['next_before']}")
+    if inbox["conversations"]:
+        moderator.get(f"/api/moderator/inbox/{inbox['conversations'][0]['user_id']}")
+    moderator.get("/api/analytics/earnings?scope=agency")
+    queue = moderator.get("/api/moderator/messages").get_json()
+    if queue["next_before"]:
+        moderator.get(f"/api/moderator/messages?before={queue['next_before']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--rows-per-user", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _configure(Path(workdir))
+        import app as app_module
+        from sqlalchemy import event
+
+        app_module.init_db()
+        _seed(app_module, args.users, args.rows_per_user)
+
+        captured: dict[str, tuple] = {}
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+                captured.setdefault(statement, parameters)
+
+        event.listen(app_module.engine, "before_cursor_execute", capture)
+        _drive(app_module)
+        event.remove(app_module.engine, "before_cursor_execute", capture)
+
+        tables = set(app_module.metadata.tables)
+        failures = 0
+        with app_module.engine.connect() as conn:
+            for statement, parameters in captured.items():
+                plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+                scans = []
+                for row in plan:
+                    match = re.match(r"SCAN (\w+)$", row[3])
+                    if match and match.group(1) in tables and match.group(1) not in ALLOWED_SCANS:
+                        scans.append(match.group(1))
+                status = "FAIL" if scans else "ok"
+                failures += bool(scans)
+                print(f"[{status}] {' '.join(statement.split())[:160]}")
+                if scans:
+                    for row in plan:
+                        print(f"         {row[3]}")
+
+        print(f"{len(captured)} queries checked, {failures} full scans")
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,22 @@ const state = {
   assets: [],
   filters: ["all", "events", "backstage", "classes", "artists"],
   activeFilter: "all",
+  nextCursor: null,
+  galleryRequest: 0,
+  videoObserver: null,
+};
+
+// The gallery reads the catalog a page at a time, filtered on the server,
+// instead of downloading the whole listing up front.
+const GALLERY_PAGE_SIZE = 24;
+const HERO_VIDEO_POOL = 24;
+
+const fetchAssetPage = async (params) => {
+  const res = await fetch(`/assets?${new URLSearchParams(params)}`);
+  if (!res.ok) {
+    throw new Error(`Failed to fetch assets: ${res.status}`);
+  }
+  return res.json();
 };
 
 const navToggle = document.querySelector(".nav-toggle");
@@ -40,6 +56,25 @@ const onScroll = () => {
   });
 };
 
+const variantsOf = (asset) => (asset.metadata && asset.metadata.variants) || null;
+
+const posterAttr = (asset) => {
+  const variants = variantsOf(asset);
+  return variants && variants.poster ? ` poster="${variants.poster}"` : "";
+};
+
+const pictureHTML = (asset, sizes = "(max-width: 768px) 50vw, 25vw") => {
+  const variants = variantsOf(asset);
+  if (!variants || !variants.srcset) {
+    return `<img src="${asset.filepath}" alt="${asset.title}" loading="lazy" />`;
+  }
+  const sources = ["avif", "webp"]
+    .filter((format) => variants.srcset[format])
+    .map((format) => `<source type="image/${format}" srcset="${variants.srcset[format]}" sizes="${sizes}" />`)
+    .join("");
+  return `<picture>${sources}<img src="${variants.thumbnail}" alt="${asset.title}" loading="lazy" /></picture>`;
+};
+
 const renderHero = (videos) => {
   const heroMedia = document.getElementById("heroMedia");
   if (!heroMedia) {
@@ -51,7 +86,7 @@ const renderHero = (videos) => {
     const card = document.createElement("div");
     card.className = "video-tile";
     card.innerHTML = `
-      <video muted loop playsinline preload="none" data-src="${asset.filepath}"></video>
+      <video muted loop playsinline preload="none"${posterAttr(asset)} data-src="${asset.filepath}"></video>
       <div class="overlay">
         <h4>${asset.title}</h4>
         <span class="play">Lecture immersive</span>
@@ -68,9 +103,9 @@ const renderCarousel = (containerId, items) => {
     const item = document.createElement("div");
     item.className = "carousel-item";
     if (asset.asset_type === "video") {
-      item.innerHTML = `<video muted loop playsinline preload="none" data-src="${asset.filepath}"></video>`;
+      item.innerHTML = `<video muted loop playsinline preload="none"${posterAttr(asset)} data-src="${asset.filepath}"></video>`;
     } else {
-      item.innerHTML = `<img src="${asset.filepath}" alt="${asset.title}" loading="lazy" />`;
+      item.innerHTML = pictureHTML(asset);
     }
     container.appendChild(item);
   });
@@ -100,6 +135,20 @@ const handleFilterClick = (e) => {
   console.log("Filter clicked:", filter);
   state.activeFilter = filter;
   renderGalleryFilters();
+  loadGalleryPage(false).catch((error) => console.error("Gallery page failed:", error));
+};
+
+const loadGalleryPage = async (append) => {
+  const params = { limit: GALLERY_PAGE_SIZE };
+  if (state.activeFilter !== "all") params.category = state.activeFilter;
+  if (append && state.nextCursor) params.cursor = state.nextCursor;
+  const requestId = ++state.galleryRequest;
+  const data = await fetchAssetPage(params);
+  // A later filter click supersedes this response.
+  if (requestId !== state.galleryRequest) return;
+  state.assets = append ? state.assets.concat(data.assets) : data.assets;
+  state.nextCursor = data.next_cursor;
+  console.log(`✅ Loaded ${state.assets.length} of ${data.total} assets (filter: ${state.activeFilter})`);
   renderMediaGrid();
 };
 
@@ -114,27 +163,14 @@ const renderMediaGrid = () => {
     return;
   }
   
-  if (!state.assets || state.assets.length === 0) {
-    console.error("No assets in state! state.assets:", state.assets);
-    grid.innerHTML = '<div class="no-media-message">Aucun média disponible. Vérifiez les logs.</div>';
-    return;
-  }
-  
   grid.innerHTML = "";
-  
-  const filtered = state.assets.filter((asset) => {
-    if (state.activeFilter === "all") return true;
-    return asset.category === state.activeFilter;
-  });
-
-  console.log(`Filtered ${filtered.length} assets (total: ${state.assets.length}, filter: ${state.activeFilter})`);
 
-  if (filtered.length === 0) {
+  if (state.assets.length === 0) {
     grid.innerHTML = '<div class="no-media-message">Aucun média trouvé pour cette catégorie.</div>';
     return;
   }
 
-  filtered.forEach((asset) => {
+  state.assets.forEach((asset) => {
     const card = document.createElement("div");
     card.className = "media-card";
     card.dataset.type = asset.asset_type;
@@ -143,8 +179,8 @@ const renderMediaGrid = () => {
     const isVideo = asset.asset_type === "video";
     const playButtonHTML = isVideo ? '<div class="play-button">&#9654;</div>' : '';
     const mediaHTML = isVideo 
-      ? `<video muted playsinline preload="metadata" data-src="${asset.filepath}"></video>`
-      : `<img src="${asset.filepath}" alt="${asset.title}" loading="lazy" />`;
+      ? `<video muted playsinline preload="metadata"${posterAttr(asset)} data-src="${asset.filepath}"></video>`
+      : pictureHTML(asset);
     
     card.innerHTML = `
       <div class="media-content">
@@ -160,8 +196,24 @@ const renderMediaGrid = () => {
     card.addEventListener("click", () => openLightbox(asset));
     grid.appendChild(card);
   });
-  
-  console.log(`✅ Rendered ${filtered.length} media items`);
+
+  if (state.nextCursor) {
+    const more = document.createElement("button");
+    more.type = "button";
+    more.className = "btn ghost gallery-more";
+    more.textContent = "Voir plus";
+    more.addEventListener("click", () => {
+      more.disabled = true;
+      loadGalleryPage(true).catch((error) => {
+        more.disabled = false;
+        console.error("Gallery page failed:", error);
+      });
+    });
+    grid.appendChild(more);
+  }
+
+  observeLazyVideos(grid);
+  console.log(`✅ Rendered ${state.assets.length} media items`);
 };
 
 const openLightbox = (asset) => {
@@ -199,9 +251,9 @@ const renderTimeline = async () => {
     const mediaHtml = assets
       .map((asset) => {
         if (asset.asset_type === "video") {
-          return `<div class="image-tile"><video muted loop playsinline preload="none" data-src="${asset.filepath}"></video></div>`;
+          return `<div class="image-tile"><video muted loop playsinline preload="none"${posterAttr(asset)} data-src="${asset.filepath}"></video></div>`;
         }
-        return `<div class="image-tile"><img src="${asset.filepath}" alt="${asset.title}" loading="lazy" /></div>`;
+        return `<div class="image-tile">${pictureHTML(asset)}</div>`;
       })
       .join("");
 
@@ -284,8 +336,15 @@ const setupForm = () => {
   });
 };
 
+const observeLazyVideos = (root) => {
+  if (!state.videoObserver) return;
+  root.querySelectorAll("video[data-src]").forEach((video) => {
+    state.videoObserver.observe(video);
+  });
+};
+
 const setupVideoLazyLoading = () => {
-  const observer = new IntersectionObserver(
+  state.videoObserver = new IntersectionObserver(
     (entries) => {
       entries.forEach((entry) => {
         if (entry.isIntersecting) {
@@ -299,15 +358,12 @@ const setupVideoLazyLoading = () => {
     },
     { threshold: 0.4 }
   );
-
-  document.querySelectorAll("video[data-src]").forEach((video) => {
-    observer.observe(video);
-  });
+  observeLazyVideos(document);
 };
 
 const registerServiceWorker = () => {
   if ("serviceWorker" in navigator) {
-    navigator.serviceWorker.register("/static/sw.js").catch(() => {});
+    navigator.serviceWorker.register("/sw.js").catch(() => {});
   }
 };
 
@@ -326,26 +382,19 @@ const bootstrap = async () => {
     console.log("Step 4: addEventListener scroll");
     window.addEventListener("scroll", onScroll, { passive: true });
 
-    console.log("Step 5: fetch /assets");
-    const res = await fetch("/assets");
-    console.log("Response status:", res.status, "ok:", res.ok);
-    
-    if (!res.ok) {
-      throw new Error(`Failed to fetch assets: ${res.status}`);
-    }
-    
-    const data = await res.json();
-    console.log("Parsed response:", data);
-    state.assets = data.assets || [];
-    console.log(`✅ Loaded ${state.assets.length} assets from server`);
-
-    // Shuffle assets randomly for media section
-    state.assets = state.assets.sort(() => Math.random() - 0.5);
+    console.log("Step 5: fetch /assets (hero videos and first gallery page)");
+    const [heroPage] = await Promise.all([
+      fetchAssetPage({
+        asset_type: "video",
+        limit: HERO_VIDEO_POOL,
+        fields: "id,filepath,title,asset_type,metadata",
+      }),
+      loadGalleryPage(false),
+    ]);
 
-    const videos = state.assets.filter((asset) => asset.asset_type === "video");
-    const images = state.assets.filter((asset) => asset.asset_type === "image");
-    
-    console.log(`Videos: ${videos.length}, Images: ${images.length}`);
+    // Shuffle the hero pool so each visit features different videos.
+    const videos = heroPage.assets.sort(() => Math.random() - 0.5);
+    console.log(`Videos: ${videos.length} of ${heroPage.total}`);
 
     console.log("Step 6: renderHero");
     renderHero(videos);
@@ -356,13 +405,10 @@ const bootstrap = async () => {
     console.log("Step 8: renderGalleryFilters");
     renderGalleryFilters();
     
-    console.log("Step 9: renderMediaGrid");
-    renderMediaGrid();
-    
-    console.log("Step 10: setupVideoLazyLoading");
+    console.log("Step 9: setupVideoLazyLoading");
     setupVideoLazyLoading();
     
-    console.log("Step 11: registerServiceWorker");
+    console.log("Step 10: registerServiceWorker");
     registerServiceWorker();
     
     console.log("=== BOOTSTRAP COMPLETED ✅ ===");
@@ -392,7 +438,7 @@ const renderAgencyCarousel = (videos) => {
   videos.slice(0, 8).forEach((asset) => {
     const item = document.createElement("div");
     item.className = "carousel-item";
-    item.innerHTML = `<video muted loop playsinline preload="none" data-src="${asset.filepath}"></video>`;
+    item.innerHTML = `<video muted loop playsinline preload="none"${posterAttr(asset)} data-src="${asset.filepath}"></video>`;
     container.appendChild(item);
   });
 };
@@ -1,35 +1,10 @@
-const CACHE_NAME = "ab-agence-portfolio-v1";
-const CORE_ASSETS = [
-  "/",
-  "/static/styles.css",
-  "/static/app.js",
-];
-
-self.addEventListener("install", (event) => {
-  event.waitUntil(
-    caches.open(CACHE_NAME).then((cache) => cache.addAll(CORE_ASSETS))
-  );
-});
+// Retired: the service worker is now generated by `flask --app app build-static`
+// and served from /sw.js. Browsers that registered this one pick up this
+// version on their next update check, drop the old cache and unregister.
+self.addEventListener("install", () => self.skipWaiting());
 
 self.addEventListener("activate", (event) => {
   event.waitUntil(
-    caches.keys().then((keys) =>
-      Promise.all(
-        keys.map((key) => {
-          if (key !== CACHE_NAME) {
-            return caches.delete(key);
-          }
-          return null;
-        })
-      )
-    )
-  );
-});
-
-self.addEventListener("fetch", (event) => {
-  event.respondWith(
-    caches.match(event.request).then((cached) =>
-      cached || fetch(event.request).catch(() => cached)
-    )
+    caches.delete("ab-agence-portfolio-v1").then(() => self.registration.unregister())
   );
 });
@@ -5,12 +5,85 @@ const selectTab = (tabId) => {
   document.querySelectorAll(".tab-panel").forEach((panel) => {
     panel.classList.toggle("active", panel.id === `tab-${tabId}`);
   });
+  syncChat();
 };
 
 document.querySelectorAll(".tab").forEach((btn) => {
   btn.addEventListener("click", () => selectTab(btn.dataset.tab));
 });
 
+const escapeHTML = (value) =>
+  String(value ?? "").replace(/[&<>"']/g, (ch) => ({ "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;" })[ch]);
+
+const sectionRenderers = {
+  events: (ev) => `
+    <div class="calendar-card">
+      <strong>${escapeHTML(ev.title)}</strong>
+      <span>${escapeHTML(ev.event_date)}</span>
+      <span>${escapeHTML(ev.location)}</span>
+    </div>`,
+  performances: (perf) => `
+    <div class="performance-card">
+      <strong>${escapeHTML(perf.title)}</strong>
+      <span>${escapeHTML(perf.performance_date)}</span>
+      <span>${escapeHTML(perf.fee)} €</span>
+    </div>`,
+  media: (media) => `
+    <div class="media-card">
+      ${media.media_type === "video"
+        ? `<video src="${escapeHTML(media.url)}" controls preload="none"></video>`
+        : `<img src="${escapeHTML(media.url)}" alt="media" loading="lazy" />`}
+    </div>`,
+};
+
+// Delegated, because fragments (and their buttons) are swapped after posts.
+document.addEventListener("click", async (e) => {
+  const btn = e.target.closest(".load-more");
+  if (!btn) return;
+  const { section, offset, target } = btn.dataset;
+  btn.disabled = true;
+  try {
+    const res = await fetch(`/api/workspace/${section}?offset=${offset}`);
+    const data = await res.json();
+    if (!res.ok) throw new Error(data.message || "Erreur serveur");
+    const container = document.getElementById(target);
+    container.insertAdjacentHTML("beforeend", data[section].map(sectionRenderers[section]).join(""));
+    const next = data[`${section}_next_offset`];
+    if (next === null) {
+      btn.remove();
+    } else {
+      btn.dataset.offset = next;
+      btn.disabled = false;
+    }
+  } catch (err) {
+    btn.disabled = false;
+    alert(err.message);
+  }
+});
+
+const refreshFragment = async (section) => {
+  const container = document.querySelector(`[data-fragment="${section}"]`);
+  if (!container) return;
+  const res = await fetch(`/workspace/fragments/${section}`);
+  if (res.ok) container.innerHTML = await res.text();
+};
+
+const earningsSummary = document.getElementById("earningsSummary");
+const loadEarnings = () => {
+  if (!earningsSummary) return;
+  fetch("/api/analytics/earnings")
+    .then((res) => (res.ok ? res.json() : null))
+    .then((data) => {
+      if (!data) return;
+      const year = data.yearly[data.yearly.length - 1];
+      const rolling = data.rolling_12_months;
+      earningsSummary.textContent =
+        `12 derniers mois : ${rolling.total} € (${rolling.performance_count} performances)` +
+        (year ? ` · ${year.year} : ${year.total} €` : "");
+    });
+};
+loadEarnings();
+
 const postForm = async (form, url, options = {}) => {
   const formData = new FormData(form);
   const isJson = options.json === true;
@@ -36,7 +109,11 @@ const bindForm = (id, url, options) => {
     e.preventDefault();
     try {
       await postForm(form, url, options);
-      window.location.reload();
+      if (options.fragment) {
+        form.reset();
+        await refreshFragment(options.fragment);
+      }
+      options.onSuccess?.();
     } catch (err) {
       alert(err.message);
     }
@@ -44,21 +121,126 @@ const bindForm = (id, url, options) => {
 };
 
 bindForm("profileForm", "/api/profile", { json: true });
-bindForm("eventForm", "/api/events", { json: true });
-bindForm("performanceForm", "/api/performances", { json: true });
-bindForm("chatForm", "/api/messages", { json: true });
+bindForm("eventForm", "/api/events", { json: true, fragment: "events" });
+bindForm("performanceForm", "/api/performances", { json: true, fragment: "performances", onSuccess: loadEarnings });
+
+const chatBox = document.getElementById("chatMessages");
+let lastMessageId = Number(chatBox?.dataset.lastId || 0);
+
+const renderMessage = (msg) => {
+  if (!chatBox || msg.id <= lastMessageId) return;
+  lastMessageId = msg.id;
+  chatBox.querySelector(".chat-empty")?.remove();
+  chatBox.insertAdjacentHTML(
+    "afterbegin",
+    `<div class="chat-message" data-id="${msg.id}">
+      <strong>${escapeHTML(msg.sender_id)}</strong>
+      <span>${escapeHTML(msg.body)}</span>
+    </div>`
+  );
+};
+
+const pollMessages = async () => {
+  const res = await fetch(`/api/messages?after=${lastMessageId}`);
+  if (!res.ok) return;
+  const data = await res.json();
+  data.messages.forEach(renderMessage);
+};
+
+// Each open stream holds a server request thread, so messages are only
+// followed while the chat tab is shown and the page is visible.
+let chatStream = null;
+let chatPoll = null;
+
+const chatVisible = () =>
+  !document.hidden && document.getElementById("tab-chat")?.classList.contains("active");
+
+function syncChat() {
+  if (!chatBox) return;
+  const open = chatStream || chatPoll;
+  if (chatVisible() && !open) {
+    if (window.EventSource) {
+      chatStream = new EventSource(`/api/messages/stream?after=${lastMessageId}`);
+      chatStream.addEventListener("message", (e) => renderMessage(JSON.parse(e.data)));
+    } else {
+      pollMessages();
+      chatPoll = setInterval(pollMessages, 5000);
+    }
+  } else if (!chatVisible() && open) {
+    chatStream?.close();
+    clearInterval(chatPoll);
+    chatStream = null;
+    chatPoll = null;
+  }
+}
+
+document.addEventListener("visibilitychange", syncChat);
+syncChat();
+
+const chatForm = document.getElementById("chatForm");
+if (chatForm) {
+  chatForm.addEventListener("submit", async (e) => {
+    e.preventDefault();
+    try {
+      const data = await postForm(chatForm, "/api/messages", { json: true });
+      renderMessage(data.message);
+      chatForm.reset();
+    } catch (err) {
+      alert(err.message);
+    }
+  });
+}
+
+const RESUMABLE_THRESHOLD = 8 * 1024 * 1024;
+
+const uploadInChunks = async (file) => {
+  const start = await fetch("/api/media/uploads", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ filename: file.name, size: file.size }),
+  });
+  const session = await start.json();
+  if (!start.ok) throw new Error(session.message || "Erreur serveur");
+
+  let offset = session.offset;
+  let retries = 0;
+  while (offset < file.size) {
+    const end = Math.min(offset + session.chunk_size, file.size);
+    try {
+      const res = await fetch(`/api/media/uploads/${session.upload_id}`, {
+        method: "PUT",
+        headers: { "Content-Range": `bytes ${offset}-${end - 1}/${file.size}` },
+        body: file.slice(offset, end),
+      });
+      const data = await res.json();
+      if (!res.ok && data.offset === undefined) throw new Error(data.message || "Erreur serveur");
+      offset = data.offset;
+      retries = 0;
+    } catch (err) {
+      if (++retries > 3) throw err;
+      const status = await fetch(`/api/media/uploads/${session.upload_id}`).then((r) => r.json());
+      offset = status.offset;
+    }
+  }
+};
 
 const mediaUploadForm = document.getElementById("mediaUploadForm");
 if (mediaUploadForm) {
   mediaUploadForm.addEventListener("submit", async (e) => {
     e.preventDefault();
     try {
-      await postForm(mediaUploadForm, "/api/media/upload");
-      window.location.reload();
+      const file = mediaUploadForm.querySelector("input[type=file]").files[0];
+      if (file && file.size > RESUMABLE_THRESHOLD) {
+        await uploadInChunks(file);
+      } else {
+        await postForm(mediaUploadForm, "/api/media/upload");
+      }
+      mediaUploadForm.reset();
+      await refreshFragment("media");
     } catch (err) {
       alert(err.message);
     }
   });
 }
 
-bindForm("mediaUrlForm", "/api/media/url", { json: true });
+bindForm("mediaUrlForm", "/api/media/url", { json: true, fragment: "media" });
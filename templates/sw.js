@@ -0,0 +1,130 @@
+// Generated by `flask --app app build-static`; served at /sw.js.
+const VERSION = {{ version|tojson }};
+const STATIC_CACHE = `ab-agence-static-${VERSION}`;
+const DATA_CACHE = "ab-agence-data";
+const MEDIA_CACHE = "ab-agence-media";
+const MEDIA_CACHE_ENTRIES = 80;
+const PRECACHE = {{ precache|tojson }};
+
+// Public JSON and the home page: fresh when online, last copy when offline.
+const NETWORK_FIRST = ["/", "/assets", "/milestones", "/booking/availability"];
+const MEDIA_PREFIXES = ["/assets/", "/uploads/", "/derivatives/"];
+// Content-addressed: a changed file gets a new URL, so a cached copy is
+// always current. Other media (replaceable /assets/ and /uploads/ files)
+// are revalidated in the background on every use.
+const IMMUTABLE_PREFIXES = ["/derivatives/", "/uploads/blobs/"];
+const FINGERPRINTED = /[.-][0-9a-f]{8,64}\.[A-Za-z0-9]+$/;
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    caches.open(STATIC_CACHE).then((cache) => cache.addAll(PRECACHE)).then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  const keep = new Set([STATIC_CACHE, DATA_CACHE, MEDIA_CACHE]);
+  event.waitUntil(
+    caches
+      .keys()
+      .then((keys) => Promise.all(keys.filter((key) => !keep.has(key)).map((key) => caches.delete(key))))
+      .then(() => self.clients.claim())
+  );
+});
+
+const cacheFirst = async (request, cacheName) => {
+  const cached = await caches.match(request);
+  if (cached) return cached;
+  const response = await fetch(request);
+  if (response.ok) {
+    const cache = await caches.open(cacheName);
+    await cache.put(request, response.clone());
+  }
+  return response;
+};
+
+const networkFirst = async (request) => {
+  const cache = await caches.open(DATA_CACHE);
+  try {
+    const response = await fetch(request);
+    if (response.ok) await cache.put(request, response.clone());
+    return response;
+  } catch (err) {
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    throw err;
+  }
+};
+
+const trimMedia = async () => {
+  const cache = await caches.open(MEDIA_CACHE);
+  const keys = await cache.keys();
+  await Promise.all(keys.slice(0, Math.max(keys.length - MEDIA_CACHE_ENTRIES, 0)).map((key) => cache.delete(key)));
+};
+
+// Video elements always ask for byte ranges. A cached full copy can answer
+// them; otherwise the range goes to the network untouched and is not cached,
+// since a partial response cannot be stored or replayed.
+const rangeResponse = async (request) => {
+  const cached = await caches.match(request.url, { cacheName: MEDIA_CACHE });
+  if (!cached) return fetch(request);
+  const blob = await cached.blob();
+  const match = /bytes=(\d*)-(\d*)/.exec(request.headers.get("Range"));
+  if (!match || (!match[1] && !match[2])) return fetch(request);
+  const start = match[1] ? Number(match[1]) : Math.max(blob.size - Number(match[2]), 0);
+  const end = match[1] && match[2] ? Math.min(Number(match[2]), blob.size - 1) : blob.size - 1;
+  if (start > end) {
+    return new Response(null, { status: 416, headers: { "Content-Range": `bytes */${blob.size}` } });
+  }
+  return new Response(blob.slice(start, end + 1), {
+    status: 206,
+    headers: {
+      "Content-Type": cached.headers.get("Content-Type") || "application/octet-stream",
+      "Content-Range": `bytes ${start}-${end}/${blob.size}`,
+      "Content-Length": String(end - start + 1),
+    },
+  });
+};
+
+const staleWhileRevalidate = async (request, cacheName) => {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(request);
+  const refresh = fetch(request).then(async (response) => {
+    if (response.ok) await cache.put(request, response.clone());
+    return response;
+  });
+  if (cached) {
+    refresh.catch(() => {});
+    return cached;
+  }
+  return refresh;
+};
+
+const media = async (request, immutable) => {
+  const response = immutable
+    ? await cacheFirst(request, MEDIA_CACHE)
+    : await staleWhileRevalidate(request, MEDIA_CACHE);
+  trimMedia();
+  return response;
+};
+
+self.addEventListener("fetch", (event) => {
+  const { request } = event;
+  if (request.method !== "GET") return;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return;
+
+  if (url.pathname.startsWith("/static/dist/") && FINGERPRINTED.test(url.pathname)) {
+    event.respondWith(cacheFirst(request, STATIC_CACHE));
+  } else if (NETWORK_FIRST.includes(url.pathname)) {
+    event.respondWith(networkFirst(request));
+  } else if (MEDIA_PREFIXES.some((prefix) => url.pathname.startsWith(prefix))) {
+    if (request.headers.has("Range")) {
+      event.respondWith(rangeResponse(request));
+    } else if (["image", "video"].includes(request.destination)) {
+      const immutable = IMMUTABLE_PREFIXES.some((prefix) => url.pathname.startsWith(prefix));
+      event.respondWith(media(request, immutable));
+    }
+  }
+  // Everything else (workspace pages, /api/*, event streams) goes straight
+  // to the network.
+});